@@ -0,0 +1,258 @@
+"""
+	BlenderCatalogue must never drop catalogues other Blender instances
+	or generators added to the file, never bring back catalogues they
+	deleted, write every transaction once, and only remove catalogues
+	within the scope of a sync.
+
+	wzrd_gen.py is loaded by path, since it doesn't need Blender
+	for catalogue manipulation.
+"""
+from pathlib import Path
+from unittest import mock
+import importlib.util
+import os
+import tempfile
+import time
+import unittest
+
+
+WZRD_GEN = Path(__file__).parents[1] / 'wzrd_blender' / 'generator' / 'wzrd_gen.py'
+
+spec = importlib.util.spec_from_file_location('wzrd_gen', WZRD_GEN)
+wzrd_gen = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(wzrd_gen)
+
+BlenderCatalogue = wzrd_gen.BlenderCatalogue
+
+
+class CatalogueTestCase(unittest.TestCase):
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp_dir.cleanup)
+		self.cat_file = Path(self.tmp_dir.name) / 'blender_assets.cats.txt'
+
+	def create_file(self, *cat_paths):
+		BlenderCatalogue(self.cat_file).create_cats(cat_paths)
+
+	def file_paths(self):
+		"""
+			Catalogue paths, as a fresh reader sees them.
+		"""
+		return set(BlenderCatalogue(self.cat_file).cat_list)
+
+	def count_writes(self):
+		write_patch = mock.patch.object(
+			BlenderCatalogue,
+			'write_atomic',
+			wraps=BlenderCatalogue.write_atomic
+		)
+		write_mock = write_patch.start()
+		self.addCleanup(write_patch.stop)
+		return write_mock
+
+
+class ExternalMergeTest(CatalogueTestCase):
+	def test_external_add_is_kept(self):
+		self.create_file('Materials/Wood')
+
+		local = BlenderCatalogue(self.cat_file)
+		external = BlenderCatalogue(self.cat_file)
+
+		with local.transaction():
+			local_uid = local.create_cat('Materials/Metal')
+			external_uid = external.create_cat('Custom/Mine')
+
+		self.assertEqual(
+			self.file_paths(),
+			{'Materials', 'Materials/Wood', 'Materials/Metal', 'Custom', 'Custom/Mine'}
+		)
+
+		reader = BlenderCatalogue(self.cat_file)
+		self.assertEqual(reader.uid('Materials/Metal'), local_uid)
+		self.assertEqual(reader.uid('Custom/Mine'), external_uid)
+		self.assertEqual(local.uid('Custom/Mine'), external_uid)
+
+	def test_external_delete_is_kept(self):
+		self.create_file('Materials/Wood', 'Materials/Metal')
+
+		local = BlenderCatalogue(self.cat_file)
+		local.cat_list
+		BlenderCatalogue(self.cat_file).del_cat('Materials/Metal')
+
+		local.create_cat('Materials/Stone')
+
+		self.assertEqual(
+			self.file_paths(),
+			{'Materials', 'Materials/Wood', 'Materials/Stone'}
+		)
+
+	def test_local_delete_survives_external_add(self):
+		self.create_file('Materials/Wood', 'Materials/Metal')
+
+		local = BlenderCatalogue(self.cat_file)
+		external = BlenderCatalogue(self.cat_file)
+
+		with local.transaction():
+			local.del_cat('Materials/Wood')
+			external.create_cat('Grunges/Dirt')
+
+		self.assertEqual(
+			self.file_paths(),
+			{'Materials', 'Materials/Metal', 'Grunges', 'Grunges/Dirt'}
+		)
+
+	def test_same_path_created_twice(self):
+		local = BlenderCatalogue(self.cat_file)
+		external = BlenderCatalogue(self.cat_file)
+
+		with local.transaction():
+			local.create_cat('Materials/Wood')
+			external.create_cat('Materials/Wood')
+
+		# Both entries survive, lookups resolve to the first one
+		reader = BlenderCatalogue(self.cat_file)
+		self.assertEqual(reader.uid('Materials/Wood'), external.uid('Materials/Wood'))
+		self.assertEqual(
+			len([
+				uid for uid, cat_path, cat_path_id in
+				BlenderCatalogue.parse(self.cat_file.read_text(encoding='utf-8'))
+				if cat_path == 'Materials/Wood'
+			]),
+			2
+		)
+
+
+class TransactionTest(CatalogueTestCase):
+	def test_single_write(self):
+		self.create_file('Materials/Wood', 'Old/Stuff')
+		write_mock = self.count_writes()
+
+		cats = BlenderCatalogue(self.cat_file)
+		with cats.transaction():
+			cats.create_cats(['Materials/Metal', 'Grunges/Dirt'])
+			with cats.transaction():
+				cats.create_cat('Stencils/Leaves')
+				cats.del_cat('Old', recursive=True)
+			self.assertEqual(write_mock.call_count, 0)
+
+		self.assertEqual(write_mock.call_count, 1)
+		self.assertEqual(
+			self.file_paths(),
+			{
+				'Materials', 'Materials/Wood', 'Materials/Metal',
+				'Grunges', 'Grunges/Dirt', 'Stencils', 'Stencils/Leaves',
+			}
+		)
+
+	def test_written_when_block_raises(self):
+		cats = BlenderCatalogue(self.cat_file)
+		with self.assertRaises(RuntimeError):
+			with cats.transaction():
+				cats.create_cat('Materials/Wood')
+				raise RuntimeError()
+
+		self.assertEqual(self.file_paths(), {'Materials', 'Materials/Wood'})
+
+	def test_no_write_without_changes(self):
+		self.create_file('Materials/Wood')
+		write_mock = self.count_writes()
+
+		cats = BlenderCatalogue(self.cat_file)
+		with cats.transaction():
+			cats.create_cat('Materials/Wood')
+			cats.del_cat('Missing')
+
+		self.assertEqual(write_mock.call_count, 0)
+
+
+class SyncTest(CatalogueTestCase):
+	def test_scoped_removal(self):
+		self.create_file(
+			'Materials/Wood', 'Materials/Metal/Rusty',
+			'Grunges/Dirt', 'Custom/Mine', 'MaterialsExtra/Kept'
+		)
+		write_mock = self.count_writes()
+
+		cats = BlenderCatalogue(self.cat_file)
+		cat_diff = cats.sync(
+			['Materials/Wood', 'Materials/Stone'],
+			scope=['Materials']
+		)
+
+		self.assertEqual(cat_diff, {
+			'add': ['Materials/Stone'],
+			'remove': ['Materials/Metal', 'Materials/Metal/Rusty'],
+		})
+		self.assertEqual(write_mock.call_count, 1)
+		self.assertEqual(
+			self.file_paths(),
+			{
+				'Materials', 'Materials/Wood', 'Materials/Stone',
+				'Grunges', 'Grunges/Dirt', 'Custom', 'Custom/Mine',
+				'MaterialsExtra', 'MaterialsExtra/Kept',
+			}
+		)
+
+	def test_unscoped_removal(self):
+		self.create_file('Materials/Wood', 'Custom/Mine')
+
+		BlenderCatalogue(self.cat_file).sync(['Materials/Wood'])
+
+		self.assertEqual(self.file_paths(), {'Materials', 'Materials/Wood'})
+
+	def test_dry_run(self):
+		self.create_file('Materials/Wood', 'Materials/Metal')
+		write_mock = self.count_writes()
+
+		cat_diff = BlenderCatalogue(self.cat_file).sync(
+			['Materials/Stone'],
+			scope=['Materials'],
+			dry_run=True
+		)
+
+		self.assertEqual(cat_diff, {
+			'add': ['Materials/Stone'],
+			'remove': ['Materials/Metal', 'Materials/Wood'],
+		})
+		self.assertEqual(write_mock.call_count, 0)
+		self.assertEqual(
+			self.file_paths(),
+			{'Materials', 'Materials/Wood', 'Materials/Metal'}
+		)
+
+	def test_recursive_delete_spares_prefix_siblings(self):
+		self.create_file('Materials/Wood/Oak', 'MaterialsExtra/Kept')
+
+		BlenderCatalogue(self.cat_file).del_cats(['Materials'], recursive=True)
+
+		self.assertEqual(self.file_paths(), {'MaterialsExtra', 'MaterialsExtra/Kept'})
+
+
+class FileLockTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp_dir.cleanup)
+		self.tgt_file = Path(self.tmp_dir.name) / 'blender_assets.cats.txt'
+
+	def test_exclusive(self):
+		with wzrd_gen.FileLock(self.tgt_file):
+			with self.assertRaises(TimeoutError):
+				wzrd_gen.FileLock(self.tgt_file, timeout=0.2).acquire()
+
+		with wzrd_gen.FileLock(self.tgt_file, timeout=0.2) as file_lock:
+			self.assertTrue(file_lock.lock_file.is_file())
+
+		self.assertFalse(file_lock.lock_file.exists())
+
+	def test_stale_lock_is_broken(self):
+		lock_file = Path(f'{self.tgt_file}.lock')
+		lock_file.write_text('crashed:1')
+		stale_time = time.time() - 600
+		os.utime(lock_file, (stale_time, stale_time,))
+
+		with wzrd_gen.FileLock(self.tgt_file, timeout=0.2, stale_after=120.0):
+			self.assertNotEqual(lock_file.read_text(), 'crashed:1')
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,122 @@
+"""
+	MapPatternMatcher / MapFinder must keep the semantics of the original
+	fnmatch loop: for every map, the first pattern that matches any file
+	wins, then the first file in listing order. Matching is case-insensitive.
+
+	wzrd_gen.py is loaded by path, since it doesn't need Blender
+	for map matching.
+"""
+from pathlib import Path
+import importlib.util
+import fnmatch
+import random
+import tempfile
+import unittest
+
+
+WZRD_GEN = Path(__file__).parents[1] / 'wzrd_blender' / 'generator' / 'wzrd_gen.py'
+
+spec = importlib.util.spec_from_file_location('wzrd_gen', WZRD_GEN)
+wzrd_gen = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(wzrd_gen)
+
+
+def reference_find_group(path_list, cfg):
+	"""
+		The original MapFinder.find_group() loop.
+	"""
+	collected_data = {map_name:None for map_name in cfg}
+
+	for map_name, pattern_list in cfg.items():
+		# Find FIRST pattern
+		for pattern in pattern_list:
+			pattern = pattern.lower()
+			for fpath in path_list:
+				if fnmatch.fnmatch(fpath.name.lower(), pattern):
+					collected_data[map_name] = fpath
+					break
+
+			if collected_data[map_name]:
+				break
+
+	return collected_data
+
+
+NAME_PARTS = (
+	'Brick', 'wall', 'COL', 'col', 'NRM', 'nrm', 'ROUGH', 'gloss', 'DISP',
+	'AO', 'var1', 'VAR2', '4K', '_', '_', '-', '.', ' ', '[1]', '01',
+)
+EXTENSIONS = ('.png', '.jpg', '.TIF', '.exr', '')
+PATTERN_PARTS = (
+	'*', '*', '_', 'col', 'COL', 'nrm', 'rough', 'gloss', 'disp', 'ao',
+	'var?', '[0-9]', '[!_]', '4k', '.png', '.jpg', '.tif', '[1]', '?',
+)
+
+
+def random_name(rng):
+	return ''.join(
+		rng.choice(NAME_PARTS) for i in range(rng.randint(1, 6))
+	) + rng.choice(EXTENSIONS)
+
+
+def random_pattern(rng):
+	return ''.join(
+		rng.choice(PATTERN_PARTS) for i in range(rng.randint(1, 5))
+	)
+
+
+class MapFinderEquivalenceTest(unittest.TestCase):
+	def check_equivalence(self, tgt_dir, cfg, base_name='', recursive=False):
+		with wzrd_gen.MapFinder(tgt_dir, cfg) as map_finder:
+			path_list = [
+				fpath for fname, fpath in
+				map_finder.named_path_list(base_name, recursive)
+			]
+			self.assertEqual(
+				map_finder.find_group(base_name, recursive),
+				reference_find_group(path_list, cfg),
+				f'cfg={cfg} files={[fpath.name for fpath in path_list]}'
+			)
+
+	def test_first_pattern_wins(self):
+		with tempfile.TemporaryDirectory() as tgt_dir:
+			for fname in ('Brick_COL_VAR2.png', 'Brick_col_var1.jpg', 'Brick_NRM.png'):
+				(Path(tgt_dir) / fname).touch()
+
+			cfg = {
+				'albedo': ['*_COL_VAR1*', '*_COL_*'],
+				'normal': ['*_nrm*'],
+				'rough': ['*_ROUGH*'],
+			}
+			with wzrd_gen.MapFinder(tgt_dir, cfg) as map_finder:
+				found = map_finder.find_group()
+
+			self.assertEqual(found['albedo'].name, 'Brick_col_var1.jpg')
+			self.assertEqual(found['normal'].name, 'Brick_NRM.png')
+			self.assertIsNone(found['rough'])
+
+			self.check_equivalence(tgt_dir, cfg)
+
+	def test_random_fixtures(self):
+		rng = random.Random(1337)
+		for round_idx in range(40):
+			with tempfile.TemporaryDirectory() as tgt_dir:
+				sub_dir = Path(tgt_dir) / 'sub'
+				sub_dir.mkdir()
+				for fname in {random_name(rng) for i in range(25)}:
+					(rng.choice((Path(tgt_dir), sub_dir,)) / fname).touch()
+
+				cfg = {
+					f'map{map_idx}': [
+						random_pattern(rng) for i in range(rng.randint(1, 4))
+					]
+					for map_idx in range(rng.randint(1, 5))
+				}
+
+				for base_name in ('', 'brick', 'WALL'):
+					for recursive in (False, True):
+						self.check_equivalence(tgt_dir, cfg, base_name, recursive)
+
+
+if __name__ == '__main__':
+	unittest.main()
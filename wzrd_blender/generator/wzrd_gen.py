@@ -1,10 +1,14 @@
 from pathlib import Path
 import importlib.util
+import inspect
 
 import fnmatch
+import re
+import concurrent.futures
 import uuid
 import hashlib
 import io
+import mmap
 import json
 import subprocess
 import secrets
@@ -12,11 +16,17 @@ import os
 import sys
 import shutil
 import socket
-import multiprocessing
+import contextlib
 import threading
 import pickle
-
-import bpy
+import queue
+import sqlite3
+import select
+import struct
+import time
+import ctypes
+import ctypes.util
+import traceback
 
 
 try:
@@ -46,6 +56,8 @@ FFMPEG = THISDIR.parent / 'bins' / 'ffmpeg.exe'
 PREVIEW_QUALITY = 4
 PREVIEW_RESOLUTION = 256
 
+WZRD_APPDATA = Path().home() / 'AppData' / 'Roaming' / 'blender_assetwzrd'
+
 
 
 def char_fixup(tgt_str):
@@ -126,1047 +138,5047 @@ class AssetBaseData:
 	
 
 
-class MapFinder:
+class ScanCache:
 	"""
-		- tgt_dir:
-		  Always absolute. Accepts strings and pathlib.Path
-		- cfg:
-		  Patterns to search by. Format is:
-		  {
-		      'diffuse': [
-		          '*_COL_VAR1*',
-		          '*_COL_VAR2*',
-		          '*_COL_*',
-		      ],
-		      'displacement': [
-		          '*_DISP*.tif',
-		          '*_DISP*.jpg',
-		      ],
-		  }
-		  Only first match is returned.
+		Persistent storage for DirectoryIndex listings.
+		Stores the listing, mtime and scan time of every scanned folder
+		in an sqlite database, so that subsequent runs only re-list folders
+		whose mtime has changed.
+
+		The database is shared by every traversal process and by
+		concurrent generator runs. It's kept in WAL mode and every
+		write is committed on its own, so that no process holds
+		the write lock for longer than a single statement.
+
+		- db_path: Absolute path to the sqlite database file.
+		  Gets created if it doesn't exist.
 	"""
-	def __init__(self, tgt_dir, cfg):
-		self.tgt_dir = Path(tgt_dir)
-		self.cfg = cfg
-
-	def __enter__(self):
-		return self
 
-	def __exit__(self, type, value, traceback):
-		pass
+	def __init__(self, db_path):
+		self.db_path = Path(db_path)
+		self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
-	def path_list(self, base_name):
-		base_name = str(base_name).lower()
-		return [
-			f for f in self.tgt_dir.glob('*')
-			if (not f.is_dir() and base_name in f.name.lower())
-		]
+		self._lock = threading.Lock()
 
-	def path_list_recursive(self, base_name):
-		base_name = str(base_name).lower()
-		return [
-			f for f in self.tgt_dir.rglob('*')
-			if ( not f.is_dir() and (base_name in f.name.lower()) )
+		# Autocommit: every statement is its own transaction
+		self.con = sqlite3.connect(
+			str(self.db_path),
+			check_same_thread=False,
+			timeout=30,
+			isolation_level=None
+		)
+		try:
+			self.con.execute('PRAGMA journal_mode=WAL')
+		except sqlite3.OperationalError as e:
+			# Another process is switching it right now
+			print('Scan cache: could not enable WAL mode:', e)
+		# WAL commits don't need to wait for the disk
+		self.con.execute('PRAGMA synchronous=NORMAL')
+		columns = [
+			row[1] for row in self.con.execute('PRAGMA table_info(dirs)')
 		]
+		if columns and 'scanned_ns' not in columns:
+			# Written before scan times were stored, can't be trusted
+			self.con.execute('DROP TABLE dirs')
+		self.con.execute(
+			"""
+			CREATE TABLE IF NOT EXISTS dirs (
+				path TEXT PRIMARY KEY,
+				mtime_ns INTEGER NOT NULL,
+				scanned_ns INTEGER NOT NULL,
+				files TEXT NOT NULL,
+				subdirs TEXT NOT NULL
+			)
+			"""
+		)
 
-	def find_group(self, base_name='', recursive=False):
-		collected_data = {map_name:None for map_name in self.cfg}
+	def get(self, dir_key):
+		"""
+			Returns (mtime_ns, scanned_ns, file_names, subdir_names) or None.
+		"""
+		with self._lock:
+			row = self.con.execute(
+				'SELECT mtime_ns, scanned_ns, files, subdirs FROM dirs WHERE path = ?',
+				(dir_key,)
+			).fetchone()
+
+		if not row:
+			return None
+
+		return row[0], row[1], json.loads(row[2]), json.loads(row[3])
+
+	def put(self, dir_key, mtime, scanned, file_names, subdir_names):
+		with self._lock:
+			self.con.execute(
+				'INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)',
+				(
+					dir_key,
+					mtime,
+					scanned,
+					json.dumps(file_names),
+					json.dumps(subdir_names),
+				)
+			)
 
-		if recursive:
-			path_list = self.path_list_recursive(base_name)
-		else:
-			path_list = self.path_list(base_name)
-
-		for map_name, pattern_list in self.cfg.items():
-			# Find FIRST pattern
-			for pattern in pattern_list:
-				pattern = pattern.lower()
-				for fpath in path_list:
-					if fnmatch.fnmatch(fpath.name.lower(), pattern):
-						collected_data[map_name] = fpath
-						break
+	def drop(self, dir_key):
+		with self._lock:
+			self.con.execute('DELETE FROM dirs WHERE path = ?', (dir_key,))
 
-				if collected_data[map_name]:
-					break
+	def flush(self):
+		"""
+			Writes are committed as they happen,
+			this only folds the WAL back into the database.
+		"""
+		with self._lock:
+			try:
+				self.con.execute('PRAGMA wal_checkpoint(PASSIVE)')
+			except sqlite3.OperationalError:
+				pass
 
-		return collected_data
+	def close(self):
+		self.flush()
+		self.con.close()
 
 
 
-class BlenderCatalogue:
+class TraversalStats:
 	"""
-		Direct blender catalogue manipulator.
-		Operates directly on "blender_assets.cats.txt" file.
-
-		- cat_file: Absolute path to "blender_assets.cats.txt"
+		Instrumentation of a single worker's traversal.
+		Counters are updated from several threads (scan pool).
 	"""
 
-	# Whether to also save the weird ~ file
-	SAVE_TILDE = False
+	COUNTERS = (
+		# Directories actually listed with os.scandir
+		'dirs_listed',
+		# Directory listings served from the memory or scan cache
+		'dirs_cached',
+		# File entries handed out by the directory index
+		'files_examined',
+		# Asset infos accepted by the yield group
+		'assets_yielded',
+		# Asset infos rejected because of their yield_category
+		'assets_skipped',
+	)
 
-	# Some default data
-	CAT_FILE_HEADER = '\n'.join([
-		"""# This is an Asset Catalog Definition file for Blender.""",
-		"""#""",
-		"""# Empty lines and lines starting with `#` will be ignored.""",
-		"""# The first non-ignored line should be the version indicator.""",
-		'''# Other lines are of the format "UUID:catalog/path/for/assets:simple catalog name"''',
-		'',
-		'VERSION 1',
-		'',
-		# '7fac3db5-9567-4666-8cfd-67aa30932412:GN Modifiers:GN Modifiers',
-	])
+	def __init__(self, worker_name):
+		self.worker_name = worker_name
+		self.wall_time = 0.0
+		# Time spent fingerprinting for the pregen index, not in wall_time
+		self.fingerprint_time = 0.0
+		self.from_index = False
+		self.counters = {counter: 0 for counter in self.COUNTERS}
+		self._lock = threading.Lock()
 
-	def __init__(self, cat_file):
-		self.cat_file = Path(cat_file)
+	def add(self, counter, amount=1):
+		with self._lock:
+			self.counters[counter] += amount
 
-		# Parsed .txt data
-		self._cats = None
+	def as_dict(self):
+		return {
+			'worker': self.worker_name,
+			'wall_time': round(self.wall_time, 4),
+			'fingerprint_time': round(self.fingerprint_time, 4),
+			'from_index': self.from_index,
+		} | self.counters
 
-	@property
-	def cat_list(self):
-		if self._cats:
-			return self._cats
 
-		file_content = self.cat_file.read_text(encoding='utf-8')
-		lines = [
-			l.strip() for l in file_content.split('\n')
-			if l.strip() and not l.strip().startswith('#')
-		]
 
-		# First line is always version identifier,
-		# which is useless here
-		del lines[0]
+class DirectoryIndex:
+	"""
+		Shared os.scandir-based directory listing cache.
+		One index per process, shared by every MapFinder and every worker.
+
+		Each listed directory is stored together with its mtime.
+		A directory only gets re-listed when its mtime changes,
+		which happens whenever an entry is added, removed or renamed in it.
+
+		Listings are sorted by name, so the output is deterministic.
+
+		A listing is only trusted, if the directory mtime is at least
+		RACY_WINDOW_NS older than the time it was listed at. Otherwise
+		a file created within the same mtime tick as the listing
+		would stay hidden forever (coarse SMB/FAT timestamps).
+		Such racy listings are re-listed on every call and never persisted.
+
+		If a ScanCache is attached (see attach_scan_cache()), listings
+		persist between runs as well. Every directory still gets
+		stat'ed, because changes deep inside a tree don't propagate
+		to the mtime of its parents, but only modified directories
+		get re-listed.
+	"""
 
-		self._cats = {}
+	_lock = threading.Lock()
 
-		for l in lines:
-			uid, cat_path, cat_path_id = l.split(':')
-			self._cats[cat_path] = (uid, cat_path_id,)
+	# Persistent ScanCache, if any
+	scan_cache = None
 
-		return self._cats
+	# Max amount of directories listed concurrently by walk()
+	scan_threads = 8
+	_scan_pool = None
 
-	def save(self):
-		file_buf = [self.CAT_FILE_HEADER]
-		for cat_path, cat_data in self.cat_list.items():
-			uid, cat_path_id = cat_data
-			file_buf.append(':'.join([
-				uid, cat_path, cat_path_id
-			]))
+	# Files stat'ed per scan pool task, see stat_files()
+	STAT_CHUNK = 256
 
-		self.cat_file.write_text('\n'.join(file_buf))
+	# Per-thread TraversalStats, see collect_stats()
+	_local = threading.local()
 
-		if self.SAVE_TILDE:
-			(self.cat_file.parent / f'{self.cat_file.name}~').write_text(
-				'\n'.join(file_buf)
-			)
+	# Listings of directories modified this close to the scan aren't trusted
+	RACY_WINDOW_NS = 2_000_000_000
 
-	def create_cat(self, cat_path):
+	# str(dir_path): (mtime_ns, scanned_ns, files, subdirs)
+	# files is a tuple of (name_lower, Path)
+	# subdirs is a tuple of Path
+	_dirs = {}
+
+	@staticmethod
+	def _scan(tgt_dir):
 		"""
-			Create a catalogue. UUID is generated automatically.
-			Duplicates are not re-generated and are skipped.
-			Returns UUID of the catalogue that was requested to be created.
+			Returns sorted (file_names, subdir_names)
 		"""
-		cat_path = cat_path.strip(' /')
-
-		if cat_path in self.cat_list:
-			return self.cat_list[cat_path][0]
+		files = []
+		subdirs = []
+		with os.scandir(tgt_dir) as entries:
+			for entry in entries:
+				try:
+					if entry.is_dir():
+						# Same as rglob: don't descend into symlinked
+						# directories, which could loop
+						if not entry.is_symlink():
+							subdirs.append(entry.name)
+					else:
+						files.append(entry.name)
+				except OSError:
+					continue
 
-		uid = str(uuid.uuid4())
+		return sorted(files), sorted(subdirs)
 
-		self.cat_list[cat_path] = (
-			uid,
-			cat_path.replace('/', '-').replace(':', '-')
+	@staticmethod
+	def _to_listing(tgt_dir, file_names, subdir_names):
+		tgt_dir = Path(tgt_dir)
+
+		return (
+			tuple(
+				(name.lower(), tgt_dir / name) for name in file_names
+			),
+			tuple(tgt_dir / name for name in subdir_names),
 		)
 
-		# Every newly created catalogue must be written to the cats.txt file,
-		# otherwise Blender is too prone to crashing.
-		self.save()
-
-		return uid
-
-	def del_cat(self, cat_path):
+	@classmethod
+	def trusted(cls, mtime, scanned):
 		"""
-			Delete a catalogue.
+			Whether a listing of a directory with the given mtime,
+			taken at the given time, can be reused while the mtime stays the same.
 		"""
-		cat_path = cat_path.strip(' /')
-		if not cat_path in self.cat_list:
-			return
+		return scanned - mtime >= cls.RACY_WINDOW_NS
 
-		del self.cat_list[cat_path]
+	@classmethod
+	def attach_scan_cache(cls, db_path):
+		"""
+			Persist listings in an sqlite database at the given path.
+			Passing None detaches the current cache.
+		"""
+		with cls._lock:
+			if cls.scan_cache:
+				cls.scan_cache.close()
+				cls.scan_cache = None
 
-		self.save()
+			if db_path:
+				cls.scan_cache = ScanCache(db_path)
 
+		return cls.scan_cache
 
+	@classmethod
+	def flush_scan_cache(cls):
+		if cls.scan_cache:
+			cls.scan_cache.flush()
 
-# Pro tip: Bump node is shit.
-# Pro tip: Displacement node's "Normal" input is rather different from
-# the shader's "Normal" input.
-class ImageBasedAsset:
-	NODE_LOCS = {
-		'shader':                 (0.0, 0.0),
-		'mat_out':                (524.969, -226.546),
-		'albedo':                 (-724.768, 794.767),
-		'albedo_ao_mix':          (-375.595, 771.867),
-		'ao':                     (-724.768, 511.072),
-		'displacement':           (-40.203, -542.172),
-		'displacement_data_node': (230.033, -542.131),
-		'normal_map':             (-724.768, -624.73),
-		'normal_map_data_node':   (-439.843, -523.823),
-		'roughness':              (-724.768, -57.549),
-		'gloss_invert':           (-446.403, -57.549),
-		'metallic':               (-724.768, 229.464),
-		'alpha':                  (-724.768, -340.217),
-		'emission_col':           (-724.768, -916.083),
-		'emission_fac':           (-724.768, -1203.0),
-	}
+	@classmethod
+	def current_stats(cls):
+		return getattr(cls._local, 'stats', None)
 
-	def __init__(self, input_data):
-		# self.input_data = AssetBaseData.defaults_all | input_data
-		self.input_data = input_data
+	@classmethod
+	def collect_stats(cls, stats):
+		"""
+			Attribute directory index usage of the current thread
+			to the given TraversalStats. Returns the previous ones.
+		"""
+		prev_stats = cls.current_stats()
+		cls._local.stats = stats
+		return prev_stats
 
-		# Getting datablock triggers entire material to be setup
-		self._datablock = None
-		# Getting material simply triggers a creation of empty material
-		# with minimal contents, such as Principled BSDF and Material Output
-		self._material = None
+	@classmethod
+	def set_scan_threads(cls, thread_count):
+		with cls._lock:
+			cls.scan_threads = max(1, int(thread_count))
+			if cls._scan_pool:
+				cls._scan_pool.shutdown(wait=False)
+				cls._scan_pool = None
 
-		# This material's "Principled BSDF" node
-		self._bsdf_node = None
-		# This material's "Material Output" node
-		self._mat_output_node = None
+	@classmethod
+	def scan_pool(cls):
+		"""
+			Shared thread pool used to list directories concurrently.
+			None if concurrency is disabled.
+		"""
+		if cls.scan_threads <= 1:
+			return None
+
+		with cls._lock:
+			if not cls._scan_pool:
+				cls._scan_pool = concurrent.futures.ThreadPoolExecutor(
+					max_workers=cls.scan_threads,
+					thread_name_prefix='wzrd_scan'
+				)
 
-	@property
-	def material(self):
-		if self._material:
-			return self._material
+		return cls._scan_pool
 
-		mat_name = self.input_data['mat_name'].split('/')[-1]
+	@classmethod
+	def listing(cls, tgt_dir, stats=None):
+		"""
+			Returns (files, subdirs) of the target directory.
+			- files: tuple of (lowercase_name, Path)
+			- subdirs: tuple of Path
+			- stats: TraversalStats to update.
+			  Default to the ones of the current thread, if any.
+			Missing/inaccessible directories are treated as empty.
+			A locked scan cache falls back to a live scan.
+		"""
+		stats = stats or cls.current_stats()
+		dir_key = str(tgt_dir)
+
+		scan_cache = cls.scan_cache
+
+		try:
+			mtime = os.stat(dir_key).st_mtime_ns
+		except OSError:
+			with cls._lock:
+				cls._dirs.pop(dir_key, None)
+			if scan_cache:
+				try:
+					scan_cache.drop(dir_key)
+				except sqlite3.OperationalError:
+					pass
+			return ((), (),)
+
+		cached = cls._dirs.get(dir_key)
+		if cached and cached[0] == mtime and cls.trusted(*cached[:2]):
+			if stats:
+				stats.add('dirs_cached')
+				stats.add('files_examined', len(cached[2]))
+			return cached[2:]
+
+		stored = None
+		if scan_cache:
+			try:
+				stored = scan_cache.get(dir_key)
+			except sqlite3.OperationalError as e:
+				# Locked by another process for too long: scan live
+				print('Scan cache unavailable for', dir_key, e)
+
+		if stored and stored[0] == mtime and cls.trusted(*stored[:2]):
+			scanned, file_names, subdir_names = stored[1:]
+			if stats:
+				stats.add('dirs_cached')
+		else:
+			# Taken before listing, anything newer makes the listing racy
+			scanned = time.time_ns()
+			try:
+				file_names, subdir_names = cls._scan(dir_key)
+			except OSError:
+				return ((), (),)
 
-		if mat_name in bpy.data.materials:
-			bpy.data.materials.remove(
-				bpy.data.materials[mat_name]
-			)
+			if stats:
+				stats.add('dirs_listed')
 
-		mat = bpy.data.materials.new(
-			name=mat_name
-		)
-		if hasattr(mat, 'use_nodes'):
-			mat.use_nodes = True
+			if scan_cache and cls.trusted(mtime, scanned):
+				try:
+					scan_cache.put(dir_key, mtime, scanned, file_names, subdir_names)
+				except sqlite3.OperationalError as e:
+					print('Scan cache unavailable for', dir_key, e)
 
-		wzrd_asset_data = {
-			'asset_type': self.input_data['asset_type'],
-			'source': str(self.input_data['import_source']),
-			'maps': AssetBaseData.defaults_maps,
-		}
+		files, subdirs = cls._to_listing(dir_key, file_names, subdir_names)
 
-		for map_name in AssetBaseData.defaults_maps.keys():
-			target_map = self.input_data[map_name]
-			if target_map and (target_map != 'None'):
-				wzrd_asset_data['maps'][map_name] = str(target_map)
+		if stats:
+			stats.add('files_examined', len(files))
 
-		mat['_wzrd_asset_data'] = wzrd_asset_data
+		with cls._lock:
+			cls._dirs[dir_key] = (mtime, scanned, files, subdirs)
 
-		mat.node_tree.nodes.clear()
+		return files, subdirs
 
-		self._material = mat
+	@classmethod
+	def files(cls, tgt_dir):
+		return cls.listing(tgt_dir)[0]
 
-		return mat
+	@classmethod
+	def walk(cls, tgt_dir):
+		"""
+			List the whole tree, one level at a time.
+			All directories of a level are listed concurrently
+			by the scan pool, which hides the per-directory round-trip
+			latency of network shares.
+
+			Returns a list of (dir_path, files, subdirs), depth-first,
+			sorted by name on every level, regardless of the order
+			in which the listings have completed.
+		"""
+		root = Path(tgt_dir)
+		pool = cls.scan_pool()
+		# Pool threads don't know which worker they're listing for
+		stats = cls.current_stats()
+
+		listings = {}
+		frontier = [root]
+		while frontier:
+			if pool and len(frontier) > 1:
+				results = list(pool.map(
+					lambda dir_path: cls.listing(dir_path, stats),
+					frontier
+				))
+			else:
+				results = [cls.listing(dir_path, stats) for dir_path in frontier]
 
-	@property
-	def node_tree(self):
-		return self.material.node_tree
+			next_frontier = []
+			for dir_path, dir_listing in zip(frontier, results):
+				listings[dir_path] = dir_listing
+				next_frontier.extend(dir_listing[1])
 
-	@property
-	def mat_output_node(self):
-		if self._mat_output_node:
-			return self._mat_output_node
+			frontier = next_frontier
 
-		self._mat_output_node = self.node_tree.nodes.new(
-			type='ShaderNodeOutputMaterial'
-		)
+		result = []
+		stack = [root]
+		while stack:
+			dir_path = stack.pop()
+			files, subdirs = listings[dir_path]
+			result.append((dir_path, files, subdirs,))
+			stack.extend(reversed(subdirs))
 
-		return self._mat_output_node
+		return result
 
-	@property
-	def bsdf_node(self):
-		if self._bsdf_node:
-			return self._bsdf_node
+	@staticmethod
+	def _stat_chunk(fpaths):
+		result = []
+		for fpath in fpaths:
+			try:
+				stat = os.stat(fpath)
+			except OSError:
+				continue
+			result.append((fpath, (stat.st_mtime_ns, stat.st_size,),))
 
-		nodes = self.node_tree.nodes
-		links = self.node_tree.links
+		return result
 
-		main_bsdf_node = nodes.new(type='ShaderNodeBsdfPrincipled')
-		mat_output_node = self.mat_output_node
+	@classmethod
+	def stat_files(cls, fpaths):
+		"""
+			Returns {fpath: (mtime_ns, size)} of the existing files.
+			Files are stat'ed in chunks of STAT_CHUNK by the scan pool.
+		"""
+		pool = cls.scan_pool()
+		if pool and len(fpaths) > cls.STAT_CHUNK:
+			stat_chunks = pool.map(
+				cls._stat_chunk,
+				chunked(fpaths, cls.STAT_CHUNK)
+			)
+		else:
+			stat_chunks = [cls._stat_chunk(fpaths)]
 
-		main_bsdf_node.location = (0, 0)
-		mat_output_node.location = (300, 0)
+		file_stats = {}
+		for stat_chunk in stat_chunks:
+			file_stats.update(stat_chunk)
 
-		links.new(
-			main_bsdf_node.outputs['BSDF'],
-			mat_output_node.inputs['Surface']
-		)
+		return file_stats
 
-		self._bsdf_node = main_bsdf_node
+	@classmethod
+	def files_recursive(cls, tgt_dir):
+		"""
+			All files under the target directory, depth-first,
+			sorted by name on every level.
+		"""
+		result = []
+		for dir_path, files, subdirs in cls.walk(tgt_dir):
+			result.extend(files)
 
-		return self._bsdf_node
+		return result
 
-	@property
-	def datablock(self):
-		if self._datablock:
-			return self._datablock
+	@classmethod
+	def invalidate(cls, tgt_dir=None):
+		"""
+			Drop the cached listing of a directory and all of its
+			subdirectories. Drops everything if no directory is given.
+		"""
+		with cls._lock:
+			if tgt_dir is None:
+				cls._dirs.clear()
+				return
 
-		self._datablock = self.create_datablock()
+			dir_key = str(tgt_dir)
+			prefix = dir_key.rstrip('/\\') + os.sep
+			for cached_key in list(cls._dirs):
+				if cached_key == dir_key or cached_key.startswith(prefix):
+					del cls._dirs[cached_key]
 
-		return self._datablock
 
-	def create_image_node(
-		self,
-		tgt_image_path,
-		premul_alpha=False,
-		allow_duplicate=False
-	):
-		img_tex_node = self.node_tree.nodes.new(type='ShaderNodeTexImage')
 
-		image_datablock = None
-		if not allow_duplicate:
-			for img in bpy.data.images:
-				if Path(bpy.path.abspath(img.filepath)) == Path(tgt_image_path):
-					image_datablock = img
-					break
+class InotifyWatcher:
+	"""
+		Recursive inotify-based watcher (Linux only).
+		Every directory of the watched trees gets its own watch,
+		newly created directories are picked up automatically.
 
-		if not image_datablock:
-			image_datablock = bpy.data.images.load(str(tgt_image_path))
+		- roots: Iterable of absolute directory paths.
+	"""
 
-		if premul_alpha:
-			image_datablock.alpha_mode = 'PREMUL'
-		else:
-			image_datablock.alpha_mode = 'CHANNEL_PACKED'
+	IN_MODIFY = 0x00000002
+	IN_ATTRIB = 0x00000004
+	IN_CLOSE_WRITE = 0x00000008
+	IN_MOVED_FROM = 0x00000040
+	IN_MOVED_TO = 0x00000080
+	IN_CREATE = 0x00000100
+	IN_DELETE = 0x00000200
+	IN_DELETE_SELF = 0x00000400
+	IN_MOVE_SELF = 0x00000800
+	IN_Q_OVERFLOW = 0x00004000
+	IN_IGNORED = 0x00008000
+	IN_ISDIR = 0x40000000
+
+	WATCH_MASK = (
+		IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+		IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+	)
 
-		img_tex_node.image = image_datablock
+	# struct inotify_event without the trailing name
+	EVENT_HEADER = struct.Struct('iIII')
 
-		return img_tex_node
+	def __init__(self, roots):
+		self.roots = [Path(root) for root in roots]
 
-	def create_datablock(self):
-		self.material['_asset_wzrd_import_src'] = str(
-			self.input_data['import_source']
+		self._libc = ctypes.CDLL(
+			ctypes.util.find_library('c') or 'libc.so.6',
+			use_errno=True
 		)
+		self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+		if self._fd < 0:
+			err = ctypes.get_errno()
+			raise OSError(err, os.strerror(err))
+
+		# wd: Path
+		self._watches = {}
+
+		try:
+			for root in self.roots:
+				self.add_tree(root)
+		except OSError:
+			self.close()
+			raise
+
+	def add_watch(self, dir_path):
+		wd = self._libc.inotify_add_watch(
+			self._fd,
+			os.fsencode(str(dir_path)),
+			self.WATCH_MASK
+		)
+		if wd < 0:
+			err = ctypes.get_errno()
+			raise OSError(err, os.strerror(err), str(dir_path))
+
+		self._watches[wd] = Path(dir_path)
+
+	def add_tree(self, root):
+		"""
+			Watch a directory tree.
+			Returns every file currently present in it.
+		"""
+		present = set()
+		for dir_path, files, subdirs in DirectoryIndex.walk(root):
+			self.add_watch(dir_path)
+			present.update(fpath for fname, fpath in files)
+
+		return present
+
+	def poll(self, timeout):
+		"""
+			Wait up to timeout seconds for changes.
+			Returns a set of changed paths (files and directories).
+		"""
+		readable, _, _ = select.select([self._fd], [], [], timeout)
+		if not readable:
+			return set()
+
+		changed = set()
+		while True:
+			try:
+				buf = os.read(self._fd, 64 * 1024)
+			except BlockingIOError:
+				break
+
+			offset = 0
+			while offset < len(buf):
+				wd, mask, cookie, name_len = self.EVENT_HEADER.unpack_from(
+					buf, offset
+				)
+				offset += self.EVENT_HEADER.size
+				name = buf[offset:offset + name_len].split(b'\0', 1)[0]
+				offset += name_len
+
+				# Events were dropped, there's no telling what changed
+				if mask & self.IN_Q_OVERFLOW:
+					changed.update(self.roots)
+					continue
+
+				if mask & self.IN_IGNORED:
+					self._watches.pop(wd, None)
+					continue
+
+				dir_path = self._watches.get(wd)
+				if not dir_path:
+					continue
+
+				tgt_path = dir_path / os.fsdecode(name) if name else dir_path
+				changed.add(tgt_path)
+
+				new_dir = all((
+					mask & self.IN_ISDIR,
+					mask & (self.IN_CREATE | self.IN_MOVED_TO),
+				))
+				if new_dir:
+					try:
+						changed.update(self.add_tree(tgt_path))
+					except OSError as e:
+						print('Watch mode: unable to watch', tgt_path, e)
+
+		return changed
+
+	def close(self):
+		if self._fd >= 0:
+			os.close(self._fd)
+			self._fd = -1
+
+
+
+class PollingWatcher:
+	"""
+		Portable fallback for InotifyWatcher.
+		Periodically compares (mtime, size) of every file in the watched
+		trees against the previous snapshot.
+		Files are stat'ed concurrently by the DirectoryIndex scan pool.
+
+		- roots: Iterable of absolute directory paths.
+	"""
+	def __init__(self, roots):
+		self.roots = [Path(root) for root in roots]
+		self._snapshot_time = 0.0
+		self._snapshot = self.snapshot()
+
+	def snapshot(self):
+		start_time = time.perf_counter()
+
+		snapshot = DirectoryIndex.stat_files([
+			fpath
+			for root in self.roots
+			for dir_path, files, subdirs in DirectoryIndex.walk(root)
+			for fname, fpath in files
+		])
+
+		self._snapshot_time = time.perf_counter() - start_time
+
+		return snapshot
+
+	def poll(self, timeout):
+		"""
+			Wait timeout seconds, then return a set of
+			changed (created, modified or deleted) file paths.
+			Snapshots never overlap: the wait starts once the previous
+			snapshot has finished, and is stretched to the duration of
+			that snapshot, so that a slow share isn't stat'ed non-stop.
+		"""
+		time.sleep(max(timeout, self._snapshot_time))
+
+		old_snapshot = self._snapshot
+		self._snapshot = self.snapshot()
+
+		changed = set(old_snapshot.keys() ^ self._snapshot.keys())
+		for fpath, fstat in self._snapshot.items():
+			if old_snapshot.get(fpath, fstat) != fstat:
+				changed.add(fpath)
+
+		return changed
+
+	def close(self):
+		pass
+
+
+class CombinedWatcher:
+	"""
+		InotifyWatcher for local roots together with
+		a PollingWatcher for network roots.
+	"""
+	def __init__(self, inotify_watcher, polling_watcher):
+		self.inotify_watcher = inotify_watcher
+		self.polling_watcher = polling_watcher
+
+	def poll(self, timeout):
+		# Inotify events are queued by the kernel in the meantime
+		changed = self.polling_watcher.poll(timeout)
+		return changed | self.inotify_watcher.poll(0)
+
+	def close(self):
+		self.inotify_watcher.close()
+		self.polling_watcher.close()
+
+
+class DeviceScheduler:
+	"""
+		Groups paths by the device actually backing them, instead of
+		by drive letter, and runs work with a bounded concurrency
+		per device.
+
+		Device keys are:
+		- ('net', host) for network shares (UNC paths, NFS/SMB/... mounts),
+		  so that several shares of the same NAS count as one device.
+		- ('dev', st_dev) for everything else.
+		- ('anchor', anchor) if the path can't be stat'ed.
+	"""
+
+	NETWORK_FS = (
+		'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'sshfs', 'fuse.sshfs',
+		'9p', 'ceph', 'glusterfs', 'fuse.glusterfs', 'afs', 'davfs',
+	)
+
+	MOUNTINFO = Path('/proc/self/mountinfo')
+
+	def __init__(self):
+		self._mounts = None
+		self._mount_points = None
+		self._lock = threading.Lock()
+		# Parent directory (or mount point): device key
+		self._keys = {}
+
+	@staticmethod
+	def _unescape_mount_path(mount_path):
+		# Spaces and such are encoded as \040 in mountinfo
+		return re.sub(
+			r'\\([0-7]{3})',
+			lambda m: chr(int(m.group(1), 8)),
+			mount_path
+		)
+
+	@property
+	def mounts(self):
+		"""
+			List of (mount_point, fs_type, source) from mountinfo,
+			longest mount point first. Empty where mountinfo is unavailable.
+		"""
+		if self._mounts is not None:
+			return self._mounts
+
+		self._mounts = []
+		try:
+			mountinfo = self.MOUNTINFO.read_text(encoding='utf-8', errors='replace')
+		except OSError:
+			return self._mounts
+
+		for line in mountinfo.splitlines():
+			fields, _, fs_fields = line.partition(' - ')
+			fields = fields.split(' ')
+			fs_fields = fs_fields.split(' ')
+			if len(fields) < 5 or len(fs_fields) < 2:
+				continue
+
+			self._mounts.append((
+				self._unescape_mount_path(fields[4]),
+				fs_fields[0],
+				self._unescape_mount_path(fs_fields[1]),
+			))
+
+		self._mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+
+		return self._mounts
+
+	@property
+	def mount_points(self):
+		if self._mount_points is not None:
+			return self._mount_points
+
+		self._mount_points = frozenset(
+			mount_point for mount_point, fs_type, source in self.mounts
+		)
+
+		return self._mount_points
+
+	@staticmethod
+	def network_host(source):
+		"""
+			"host:/export/path" or "//host/share" -> "host"
+		"""
+		source = source.replace('\\', '/')
+		if source.startswith('//'):
+			return source[2:].split('/')[0].lower()
+		if ':' in source:
+			return source.split(':')[0].lower()
+		return None
+
+	def _find_device_key(self, tgt_path):
+		tgt_path = Path(tgt_path)
+
+		# Windows UNC paths
+		anchor = tgt_path.anchor
+		if anchor.startswith('\\\\') or anchor.startswith('//'):
+			return ('net', self.network_host(str(tgt_path)),)
+
+		real_path = os.path.realpath(tgt_path)
+		for mount_point, fs_type, source in self.mounts:
+			is_under = any((
+				real_path == mount_point,
+				real_path.startswith(mount_point.rstrip('/') + '/'),
+			))
+			if not is_under:
+				continue
+
+			if fs_type in self.NETWORK_FS:
+				host = self.network_host(source)
+				if host:
+					return ('net', host,)
+			break
+
+		try:
+			return ('dev', os.stat(tgt_path).st_dev,)
+		except OSError:
+			return ('anchor', anchor,)
+
+	def device_key(self, tgt_path, is_dir=False):
+		"""
+			Files are looked up and cached per parent directory, since all
+			files of a directory live on the same device. This way, a folder
+			full of files costs a single lookup (realpath, stat).
+			- is_dir: The path is a directory, e.g. a library root.
+			  Directories are looked up as is, since they may be mount points,
+			  symlinks or junctions to another device.
+		"""
+		tgt_path = os.path.abspath(str(tgt_path))
+		lookup_path = tgt_path
+		if not is_dir and not tgt_path in self.mount_points:
+			lookup_path = os.path.dirname(tgt_path)
+
+		dev_key = self._keys.get(lookup_path)
+		if dev_key:
+			return dev_key
+
+		dev_key = self._find_device_key(lookup_path)
+		with self._lock:
+			self._keys[lookup_path] = dev_key
+
+		return dev_key
+
+	def group(self, items, path_of, is_dir=False):
+		"""
+			Returns {device_key: [items]}, preserving the order of items.
+			- path_of: Function returning the path of an item.
+			- is_dir: The paths are directories, see device_key().
+		"""
+		groups = {}
+		for item in items:
+			dev_key = self.device_key(path_of(item), is_dir)
+			groups.setdefault(dev_key, []).append(item)
+
+		return groups
+
+	def lanes(self, items, path_of, per_device, is_dir=False):
+		"""
+			Split items into lanes, at most per_device lanes per device.
+			Items are distributed round-robin, every lane is a list.
+		"""
+		lanes = []
+		for device_items in self.group(items, path_of, is_dir).values():
+			lane_count = max(1, min(per_device, len(device_items)))
+			lanes.extend(
+				device_items[lane_idx::lane_count]
+				for lane_idx in range(lane_count)
+			)
+
+		return lanes
+
+	def run(self, items, path_of, task, per_device):
+		"""
+			Call task(item) for every item. All devices are worked on
+			in parallel, with at most per_device concurrent tasks each.
+			Blocks until done. Exceptions raised by task are printed.
+		"""
+		def run_lane(lane):
+			for item in lane:
+				try:
+					task(item)
+				except Exception as e:
+					print('Task failed for', item, e)
+
+		threads = [
+			threading.Thread(target=run_lane, args=(lane,))
+			for lane in self.lanes(items, path_of, per_device)
+		]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+
+
+class WorkerManifest:
+	"""
+		Optional declarative description of a worker, which allows
+		skipping the worker entirely, without running it.
+
+		Workers may define the following attributes:
+		- YIELD_CATEGORIES:
+		  Every yield_category the worker can emit.
+		  Workers without it are assumed to emit anything.
+		- LIB_ROOTS:
+		  Every directory the worker reads from.
+		  Default to [LIB_BASE_PATH].
+	"""
+	def __init__(self, worker):
+		self.worker = worker
+
+		self.yield_categories = None
+		if getattr(worker, 'YIELD_CATEGORIES', None):
+			self.yield_categories = frozenset(worker.YIELD_CATEGORIES)
+
+		self.roots = tuple(
+			Path(root) for root in
+			getattr(worker, 'LIB_ROOTS', None) or (worker.LIB_BASE_PATH,)
+		)
+
+	def can_yield(self, yield_group):
+		"""
+			- yield_group: set of yield categories, may contain $all.
+		"""
+		if '$all' in yield_group or self.yield_categories is None:
+			return True
+
+		return not self.yield_categories.isdisjoint(yield_group)
+
+	@property
+	def roots_available(self):
+		return any(root.is_dir() for root in self.roots)
+
+	def contains(self, tgt_path):
+		return any(
+			tgt_path == root or root in tgt_path.parents
+			for root in self.roots
+		)
+
+
+
+class WorkerResultIndex:
+	"""
+		Versioned, per-worker replacement for the plain pregen_index pickle.
+
+		Stores the raw (not yet filtered by yield_group) traversal results
+		of every worker, keyed by the worker's name.
+		Every entry carries a fingerprint of the worker's module file and
+		of its library trees (see WorkerManifest.roots). A worker is only re-traversed when
+		its fingerprint doesn't match the stored one.
+
+		- index_path: Absolute path to the index file.
+		  Gets created if it doesn't exist.
+		  Index files of a different VERSION are ignored and rebuilt.
+		  None = in-memory only index (used by traversal processes).
+	"""
+
+	# Bump this whenever the format of asset infos or the index changes
+	VERSION = 1
+
+	def __init__(self, index_path):
+		self.index_path = Path(index_path) if index_path else None
+		self._lock = threading.Lock()
+
+		# worker_name: {'fingerprint': str, 'asset_infos': list}
+		self._workers = None
+
+		# Names of workers, whose entries were (re)built this run
+		self.updated = set()
+
+	@property
+	def workers(self):
+		if self._workers is not None:
+			return self._workers
+
+		self._workers = {}
+
+		if not self.index_path or not self.index_path.is_file():
+			return self._workers
+
+		try:
+			with open(self.index_path, 'rb') as tgt_file:
+				index_data = pickle.load(tgt_file)
+		except Exception as e:
+			print('Unable to read pregen index', self.index_path, e)
+			return self._workers
+
+		if not isinstance(index_data, dict) or index_data.get('version') != self.VERSION:
+			print('Pregen index', self.index_path, 'is outdated, rebuilding')
+			return self._workers
+
+		self._workers = index_data['workers']
+
+		return self._workers
+
+	@staticmethod
+	def source_fingerprint(worker):
+		"""
+			Hash of the whole module file the worker is defined in,
+			so that edits to helpers the worker calls count as well.
+		"""
+		try:
+			source = Path(inspect.getfile(worker)).read_bytes()
+		except (OSError, TypeError):
+			source = getattr(worker, '__qualname__', worker.__name__).encode()
+
+		return hashlib.sha1(source).hexdigest()
+
+	@staticmethod
+	def tree_fingerprint(lib_root):
+		"""
+			Hash of every file and directory name in the tree,
+			plus size and mtime of every file, so that edited sidecar
+			and metadata files, which workers read, count as well.
+			Listing is cheap with the DirectoryIndex, since unchanged
+			folders don't get re-listed. Files still get stat'ed,
+			concurrently by the scan pool.
+		"""
+		tree = DirectoryIndex.walk(lib_root)
+		file_stats = DirectoryIndex.stat_files([
+			fpath
+			for dir_path, files, subdirs in tree
+			for fname, fpath in files
+		])
+
+		tree_hash = hashlib.sha1()
+		for dir_path, files, subdirs in tree:
+			tree_hash.update(str(dir_path).encode('utf-8', 'surrogateescape'))
+			for fname, fpath in files:
+				tree_hash.update(b'\0f' + fpath.name.encode('utf-8', 'surrogateescape'))
+				file_stat = file_stats.get(fpath)
+				if file_stat:
+					tree_hash.update(
+						f':{file_stat[1]}:{file_stat[0]}'.encode()
+					)
+			for subdir in subdirs:
+				tree_hash.update(b'\0d' + subdir.name.encode('utf-8', 'surrogateescape'))
+
+		return tree_hash.hexdigest()
+
+	def fingerprint(self, worker):
+		return ':'.join((
+			worker.__name__,
+			self.source_fingerprint(worker),
+			*(
+				self.tree_fingerprint(root)
+				for root in WorkerManifest(worker).roots
+			),
+		))
+
+	def get(self, worker, fingerprint):
+		"""
+			Returns stored asset infos of the worker,
+			or None if there are none or they're stale.
+		"""
+		entry = self.workers.get(worker.__name__)
+		if not entry or entry['fingerprint'] != fingerprint:
+			return None
+
+		return entry['asset_infos']
+
+	def put(self, worker, fingerprint, asset_infos):
+		with self._lock:
+			self.workers[worker.__name__] = {
+				'fingerprint': fingerprint,
+				'asset_infos': asset_infos,
+			}
+			self.updated.add(worker.__name__)
+
+	def entries(self, worker_names):
+		return {
+			worker_name: self.workers[worker_name]
+			for worker_name in worker_names
+			if worker_name in self.workers
+		}
+
+	def merge(self, entries):
+		"""
+			Merge entries built elsewhere (by a traversal process).
+		"""
+		with self._lock:
+			self.workers.update(entries)
+			self.updated.update(entries)
+
+	def save(self):
+		self.index_path.parent.mkdir(parents=True, exist_ok=True)
+		tmp_path = self.index_path.with_name(f'{self.index_path.name}.tmp')
+
+		with self._lock:
+			with open(tmp_path, 'wb') as tgt_file:
+				pickle.dump(
+					{
+						'version': self.VERSION,
+						'workers': self.workers,
+					},
+					tgt_file
+				)
+
+		os.replace(tmp_path, self.index_path)
+
+
+
+class ContentHasher:
+	"""
+		Cached file size, partial hash and full hash lookups.
+		Thread-safe, every value is computed at most once per path.
+	"""
+
+	# Amount of bytes hashed at the start and at the end of a file
+	# for the partial hash
+	PARTIAL_SIZE = 64 * 1024
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._sizes = {}
+		self._partial = {}
+		self._full = {}
+
+	def _cached(self, cache, fpath, compute):
+		fpath = str(fpath)
+		if fpath in cache:
+			return cache[fpath]
+
+		try:
+			result = compute(fpath)
+		except OSError as e:
+			print('Unable to hash', fpath, e)
+			result = None
+
+		with self._lock:
+			cache[fpath] = result
+
+		return result
+
+	def size(self, fpath):
+		return self._cached(
+			self._sizes, fpath,
+			lambda fpath: os.stat(fpath).st_size
+		)
+
+	def _compute_partial(self, fpath):
+		file_hash = hashlib.blake2b(digest_size=16)
+		with open(fpath, 'rb') as src_file:
+			file_hash.update(src_file.read(self.PARTIAL_SIZE))
+			src_file.seek(0, os.SEEK_END)
+			file_size = src_file.tell()
+			if file_size > self.PARTIAL_SIZE * 2:
+				src_file.seek(file_size - self.PARTIAL_SIZE)
+				file_hash.update(src_file.read(self.PARTIAL_SIZE))
+
+		return file_hash.hexdigest()
+
+	def partial(self, fpath):
+		return self._cached(self._partial, fpath, self._compute_partial)
+
+	@staticmethod
+	def _compute_full(fpath):
+		file_hash = hashlib.blake2b()
+		with open(fpath, 'rb') as src_file:
+			try:
+				with mmap.mmap(src_file.fileno(), 0, access=mmap.ACCESS_READ) as file_map:
+					file_hash.update(file_map)
+			except (ValueError, OSError):
+				# Empty files and filesystems without mmap support
+				src_file.seek(0)
+				while chunk := src_file.read(1024**2):
+					file_hash.update(chunk)
+
+		return file_hash.hexdigest()
+
+	def full(self, fpath):
+		return self._cached(self._full, fpath, self._compute_full)
+
+
+
+class DuplicateFilter:
+	"""
+		Streaming duplicate material detection.
+		Asset infos, whose maps have exactly the same contents as the maps
+		of another asset info, are dropped, so that they're only
+		imported, cooked and rendered once.
+
+		The copy kept out of every group of duplicates is the one with
+		the smallest (mat_name, import_source), no matter in which order
+		the copies arrive. This keeps the same copy across runs,
+		even though traversal order depends on thread timing.
+
+		Comparison goes from cheap to expensive:
+		- File sizes of all maps
+		- Hash of the first and last PARTIAL_SIZE bytes of every map
+		- Full hash of every map
+		Expensive steps only happen for assets colliding on the
+		previous step. Files are hashed in parallel, per device.
+	"""
+	def __init__(self, device_scheduler, per_device=4):
+		self.device_scheduler = device_scheduler
+		self.per_device = per_device
+		self.hasher = ContentHasher()
+
+		# size_key: [[asset_info, ...], ...]
+		# Every inner list is a group of duplicates
+		self._size_buckets = {}
+
+		# canonical mat_name: [duplicate mat_name, ...]
+		self.merged = {}
+		# Dropped asset infos
+		self.duplicates = []
+
+	@staticmethod
+	def map_files(asset_info):
+		"""
+			Returns [(map_name, Path)] of maps pointing to actual files.
+		"""
+		map_files = []
+		for map_name in AssetBaseData.defaults_maps:
+			map_path = asset_info.get(map_name)
+			if not map_path or str(map_path) == 'None' or str(map_path).startswith('$'):
+				continue
+			map_files.append((map_name, Path(map_path),))
+
+		return map_files
+
+	def _key(self, asset_info, file_key):
+		map_files = self.map_files(asset_info)
+		if not map_files:
+			return None
+
+		file_keys = tuple(
+			(map_name, file_key(map_path),)
+			for map_name, map_path in map_files
+		)
+		if any(key is None for map_name, key in file_keys):
+			return None
+
+		# Alpha taken from albedo ($from_albedo, ...) changes the material
+		alpha_source = str(asset_info.get('alpha'))
+
+		return (
+			asset_info.get('asset_type'),
+			alpha_source if alpha_source.startswith('$') else None,
+			tuple(asset_info.get('disconnected') or ()),
+			file_keys,
+		)
+
+	def size_key(self, asset_info):
+		return self._key(asset_info, self.hasher.size)
+
+	def partial_key(self, asset_info):
+		return self._key(asset_info, self.hasher.partial)
+
+	def full_key(self, asset_info):
+		return self._key(asset_info, self.hasher.full)
+
+	def _prefetch(self, asset_infos, file_key):
+		"""
+			Compute the given file key for every map of every asset info
+			in parallel, so that later lookups are cached.
+		"""
+		fpaths = {
+			map_path
+			for asset_info in asset_infos
+			for map_name, map_path in self.map_files(asset_info)
+		}
+		self.device_scheduler.run(
+			sorted(fpaths),
+			lambda fpath: fpath,
+			file_key,
+			self.per_device
+		)
+
+	def _prefetch_chunk(self, info_chunk):
+		self._prefetch(info_chunk, self.hasher.size)
+
+		# Assets colliding by size, either with earlier assets
+		# or within the chunk
+		size_counts = {}
+		for asset_info in info_chunk:
+			size_key = self.size_key(asset_info)
+			if size_key is not None:
+				size_counts[size_key] = size_counts.get(size_key, 0) + 1
+
+		colliding = []
+		for size_key, count in size_counts.items():
+			if count > 1 or size_key in self._size_buckets:
+				colliding.extend(
+					group[0] for group in self._size_buckets.get(size_key, ())
+				)
+				colliding.extend(
+					asset_info for asset_info in info_chunk
+					if self.size_key(asset_info) == size_key
+				)
+
+		if not colliding:
+			return
+
+		self._prefetch(colliding, self.hasher.partial)
+
+		partial_counts = {}
+		for asset_info in colliding:
+			partial_key = self.partial_key(asset_info)
+			partial_counts[partial_key] = partial_counts.get(partial_key, 0) + 1
+
+		self._prefetch(
+			[
+				asset_info for asset_info in colliding
+				if partial_counts[self.partial_key(asset_info)] > 1
+			],
+			self.hasher.full
+		)
+
+	@staticmethod
+	def canonical_key(asset_info):
+		return (asset_info['mat_name'], str(asset_info.get('import_source')),)
+
+	def find_group(self, asset_info):
+		"""
+			Returns the group of duplicates (list of asset infos)
+			the asset info belongs to, after adding it to the group.
+			Creates a new group if there's no matching one yet.
+		"""
+		size_key = self.size_key(asset_info)
+		if size_key is None:
+			return [asset_info]
+
+		bucket = self._size_buckets.setdefault(size_key, [])
+		if bucket:
+			partial_key = self.partial_key(asset_info)
+			for group in bucket:
+				candidate = group[0]
+				if self.partial_key(candidate) != partial_key:
+					continue
+				if self.full_key(candidate) == self.full_key(asset_info):
+					group.append(asset_info)
+					return group
+
+		group = [asset_info]
+		bucket.append(group)
+
+		return group
+
+	def filter(self, asset_infos, chunk_size=512):
+		"""
+			Yield asset infos, except for duplicates.
+			Any asset info may still turn out to have a duplicate
+			sorting before it, until the input is exhausted. Therefore
+			nothing is yielded before that. Files are hashed
+			chunk by chunk while the input streams in.
+		"""
+		groups = []
+		for info_chunk in chunked(asset_infos, chunk_size):
+			self._prefetch_chunk(info_chunk)
+
+			for asset_info in info_chunk:
+				group = self.find_group(asset_info)
+				if len(group) == 1:
+					groups.append(group)
+
+		for group in groups:
+			original, *duplicates = sorted(group, key=self.canonical_key)
+			for duplicate in duplicates:
+				print(
+					'Duplicate:', duplicate['mat_name'],
+					'is the same as', original['mat_name']
+				)
+				self.merged.setdefault(original['mat_name'], []).append(
+					duplicate['mat_name']
+				)
+				self.duplicates.append(duplicate)
+
+			yield original
+
+	def write_report(self, report_path):
+		report_path = Path(report_path)
+		report_path.parent.mkdir(parents=True, exist_ok=True)
+		report_path.write_text(
+			json.dumps(
+				{
+					'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+					'merged_count': sum(len(dupes) for dupes in self.merged.values()),
+					'merged': self.merged,
+				},
+				indent='\t'
+			),
+			encoding='utf-8'
+		)
+
+		print('Duplicate report written to', report_path)
+
+
+
+class SourceFingerprint:
+	"""
+		Fingerprint of everything a generated material depends on:
+		path, size and mtime of every source map and of the preview
+		image, plus every other generation parameter of the asset info.
+		Identical fingerprints mean the material would come out the same.
+
+		- hasher: ContentHasher, to also include a partial content hash
+		  of every file, for filesystems with unreliable mtimes.
+		  None = don't hash.
+	"""
+
+	# Bump when the generator starts producing different materials
+	# from the same asset infos
+	VERSION = 1
+
+	def __init__(self, hasher=None):
+		self.hasher = hasher
+
+	def file_state(self, fpath):
+		try:
+			file_stat = os.stat(fpath)
+		except OSError:
+			return None
+
+		file_state = [str(fpath), file_stat.st_size, file_stat.st_mtime_ns]
+		if self.hasher:
+			file_state.append(self.hasher.partial(fpath))
+
+		return file_state
+
+	def compute(self, asset_info):
+		sources = {}
+		params = {}
+		for key, value in asset_info.items():
+			is_file = all((
+				key in AssetBaseData.defaults_maps or key == 'preview',
+				value,
+				str(value) != 'None',
+				not str(value).startswith('$'),
+			))
+			if is_file:
+				sources[key] = self.file_state(value)
+			else:
+				params[key] = value
+
+		return hashlib.blake2b(
+			json.dumps(
+				{
+					'version': self.VERSION,
+					'sources': sources,
+					'params': params,
+				},
+				sort_keys=True,
+				default=str
+			).encode(),
+			digest_size=16
+		).hexdigest()
+
+
+
+def chunked(iterable, chunk_size):
+	"""
+		Yield lists of up to chunk_size items from any iterable.
+	"""
+	chunk = []
+	for item in iterable:
+		chunk.append(item)
+		if len(chunk) >= chunk_size:
+			yield chunk
+			chunk = []
+
+	if chunk:
+		yield chunk
+
+
+def write_frame(tgt_file, data):
+	"""
+		Write a length-prefixed pickle frame.
+	"""
+	payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+	tgt_file.write(len(payload).to_bytes(8, 'little'))
+	tgt_file.write(payload)
+	tgt_file.flush()
+
+
+def read_frame(src_file):
+	"""
+		Read a frame written by write_frame().
+		Returns None on EOF.
+	"""
+	header = src_file.read(8)
+	if len(header) < 8:
+		return None
+
+	payload_len = int.from_bytes(header, 'little')
+	payload = src_file.read(payload_len)
+	if len(payload) < payload_len:
+		return None
+
+	return pickle.loads(payload)
+
+
+# Command line switch, which turns this script into a traversal process
+TRAVERSAL_PROCESS_ARG = '--wzrd-traverse'
+
+
+def traversal_process_main():
+	"""
+		Entry point of traversal processes.
+		Spawned with the plain Python interpreter, which means
+		no bpy is available here, and none should be needed.
+
+		Reads a pickled job from stdin and streams frames to stdout:
+		- ('asset_infos', [asset_info, ...])
+		- ('index', {worker_name: index_entry}), if a pregen index was given
+		- ('stats', [TraversalStats.as_dict(), ...])
+		- ('error', traceback_str)
+		- ('done', None)
+	"""
+	out_file = sys.stdout.buffer
+	# Workers print a lot, which must not end up in the frame stream
+	sys.stdout = sys.stderr
+
+	try:
+		job = pickle.load(sys.stdin.buffer)
+
+		if job['scan_cache']:
+			DirectoryIndex.attach_scan_cache(job['scan_cache'])
+		DirectoryIndex.set_scan_threads(job['scan_threads'])
+
+		workers = [
+			worker for worker in AssetWizard.load_workers(job['worker_index'])
+			if worker.__name__ in job['worker_names']
+		]
+
+		result_index = None
+		if job['index_entries'] is not None:
+			result_index = WorkerResultIndex(None)
+			result_index.workers.update(job['index_entries'])
+
+		stats_list = []
+		chunk = []
+		for asset_info in AssetWizard.iter_traversal(
+			job['yield_group'],
+			workers,
+			result_index,
+			stats_list
+		):
+			chunk.append(asset_info)
+			if len(chunk) >= job['chunk_size']:
+				write_frame(out_file, ('asset_infos', chunk,))
+				chunk = []
+
+		if chunk:
+			write_frame(out_file, ('asset_infos', chunk,))
+
+		if result_index:
+			write_frame(out_file, (
+				'index',
+				result_index.entries(result_index.updated),
+			))
+
+		write_frame(out_file, (
+			'stats',
+			[stats.as_dict() for stats in stats_list],
+		))
+
+		DirectoryIndex.flush_scan_cache()
+	except Exception as e:
+		write_frame(out_file, ('error', traceback.format_exc(),))
+		return
+
+	write_frame(out_file, ('done', None,))
+
+
+# Command line switch, which turns this script into a shard process
+SHARD_PROCESS_ARG = '--wzrd-shard'
+
+
+def shard_process_main():
+	"""
+		Entry point of shard processes.
+		Spawned as a headless Blender:
+		blender -b --factory-startup --python wzrd_gen.py -- --wzrd-shard job_file
+
+		Builds the assets of a single shard into its own blend file.
+		If the shard file exists, it's opened and updated in place.
+		The job file is a pickled dict:
+		- cfg: Config of the parent AssetWizard
+		- shard_file: Absolute path of the blend file to build
+		- result_file: Absolute path of the pickled result to write:
+		  {'mat_names': [...], 'cat_paths': [...], 'error': traceback_str or None}
+		- asset_infos: [asset_info, ...]
+	"""
+	global BLEND_FILE
+
+	job_file = sys.argv[sys.argv.index(SHARD_PROCESS_ARG) + 1]
+	with open(job_file, 'rb') as job_buf:
+		job = pickle.load(job_buf)
+
+	result = {
+		'mat_names': [],
+		'cat_paths': [],
+		'error': None,
+	}
+	try:
+		# Previews are rendered from the blend file the assets live in
+		BLEND_FILE = Path(job['shard_file'])
+		# Existing shard files are opened by Blender directly
+		if not bpy.data.filepath:
+			bpy.ops.wm.save_as_mainfile(filepath=str(BLEND_FILE))
+
+		asset_wzrd = AssetWizard(job['cfg'])
+		result['cat_paths'] = sorted(
+			asset_wzrd.process_assets(job['asset_infos'])
+		)
+		result['mat_names'] = [
+			mat.name for mat in bpy.data.materials if mat.asset_data
+		]
+	except Exception as e:
+		result['error'] = traceback.format_exc()
+
+	with open(job['result_file'], 'wb') as result_buf:
+		pickle.dump(result, result_buf)
+
+	if result['error']:
+		sys.exit(1)
+
+
+def create_library_watcher(roots, device_scheduler):
+	"""
+		Returns an InotifyWatcher for local roots, if available.
+		Otherwise - a PollingWatcher.
+		Roots on network shares (see DeviceScheduler) are always polled,
+		because inotify doesn't report changes made by other clients
+		of the share. Mixed roots get a CombinedWatcher.
+	"""
+	local_roots = []
+	network_roots = []
+	for root in roots:
+		if device_scheduler.device_key(root, is_dir=True)[0] == 'net':
+			network_roots.append(root)
+		else:
+			local_roots.append(root)
+
+	if not local_roots or not sys.platform.startswith('linux'):
+		return PollingWatcher(roots)
+
+	try:
+		inotify_watcher = InotifyWatcher(local_roots)
+	except (OSError, AttributeError) as e:
+		print('Watch mode: inotify unavailable, falling back to polling:', e)
+		return PollingWatcher(roots)
+
+	if not network_roots:
+		return inotify_watcher
+
+	return CombinedWatcher(inotify_watcher, PollingWatcher(network_roots))
+
+
+
+class MapPatternMatcher:
+	"""
+		MapFinder's cfg, compiled into a single regex.
+
+		Every map is an optional lookahead and every pattern of that map
+		is a named alternative inside the lookahead, in the original order.
+		Regex alternation is tried left to right, so the group that
+		ends up being captured is the first pattern that matches,
+		same as with looping over the patterns with fnmatch.
+
+		One match() call classifies a filename against all maps at once.
+		Compiled matchers are cached per cfg.
+	"""
+
+	_lock = threading.Lock()
+	_compiled = {}
+
+	def __init__(self, cfg):
+		self.map_names = tuple(cfg)
+
+		# Regex group name: (map_name, pattern_rank)
+		self.groups = {}
+
+		# (map_name, pattern_rank): regex capturing the base name,
+		# which is whatever the leading "*" of the pattern matched.
+		# None for patterns that don't start with "*"
+		self.base_exprs = {}
+
+		map_exprs = []
+		for map_idx, (map_name, pattern_list) in enumerate(cfg.items()):
+			alternatives = []
+			for rank, pattern in enumerate(pattern_list):
+				group_name = f'wzrd_m{map_idx}p{rank}'
+				self.groups[group_name] = (map_name, rank,)
+				alternatives.append(
+					f'(?P<{group_name}>{fnmatch.translate(pattern.lower())})'
+				)
+
+				self.base_exprs[(map_name, rank,)] = None
+				if pattern.startswith('*'):
+					self.base_exprs[(map_name, rank,)] = re.compile(
+						'(.*?)' + fnmatch.translate(pattern.lower().lstrip('*')),
+						re.S
+					)
+
+			if alternatives:
+				map_exprs.append(f'(?:(?={"|".join(alternatives)}))?')
+
+		self.regex = re.compile(''.join(map_exprs))
+
+	@classmethod
+	def from_cfg(cls, cfg):
+		cfg_key = tuple(
+			(map_name, tuple(pattern_list),)
+			for map_name, pattern_list in cfg.items()
+		)
+
+		matcher = cls._compiled.get(cfg_key)
+		if matcher:
+			return matcher
+
+		matcher = cls(cfg)
+		with cls._lock:
+			cls._compiled[cfg_key] = matcher
+
+		return matcher
+
+	def classify(self, fname):
+		"""
+			- fname: lowercase file name.
+			Returns {map_name: pattern_rank} for every map that has
+			a matching pattern. Lower rank = higher priority.
+		"""
+		return {
+			self.groups[group_name][0]: self.groups[group_name][1]
+			for group_name, group_val in self.regex.match(fname).groupdict().items()
+			if group_val is not None and group_name in self.groups
+		}
+
+	def base_name(self, fname, map_name, rank):
+		"""
+			Strip the map suffix off a filename, according to the pattern
+			it was classified with.
+			For example, "*_COL_*" turns "brick_wall_COL_4k.jpg"
+			into "brick_wall".
+			- fname: original (not lowercased) file name.
+			Trailing separators are stripped. Returns an empty string
+			for patterns that don't start with "*".
+		"""
+		base_expr = self.base_exprs[(map_name, rank,)]
+		if not base_expr:
+			return ''
+
+		fname_lower = fname.lower()
+		base_len = len(base_expr.match(fname_lower).group(1))
+
+		# Lowercasing can change the length of some unicode strings
+		if len(fname_lower) == len(fname):
+			base = fname[:base_len]
+		else:
+			base = fname_lower[:base_len]
+
+		return base.rstrip(' _-.')
+
+
+
+class MapFinder:
+	"""
+		- tgt_dir:
+		  Always absolute. Accepts strings and pathlib.Path
+		- cfg:
+		  Patterns to search by. Format is:
+		  {
+		      'diffuse': [
+		          '*_COL_VAR1*',
+		          '*_COL_VAR2*',
+		          '*_COL_*',
+		      ],
+		      'displacement': [
+		          '*_DISP*.tif',
+		          '*_DISP*.jpg',
+		      ],
+		  }
+		  Only first match is returned.
+	"""
+	def __init__(self, tgt_dir, cfg):
+		self.tgt_dir = Path(tgt_dir)
+		self.cfg = cfg
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, type, value, traceback):
+		pass
+
+	def named_path_list(self, base_name, recursive=False):
+		"""
+			Same as path_list(), but returns (lowercase_name, Path) pairs.
+		"""
+		base_name = str(base_name).lower()
+
+		if recursive:
+			listing = DirectoryIndex.files_recursive(self.tgt_dir)
+		else:
+			listing = DirectoryIndex.files(self.tgt_dir)
+
+		return [
+			(fname, fpath) for fname, fpath in listing
+			if base_name in fname
+		]
+
+	def path_list(self, base_name):
+		return [
+			fpath for fname, fpath in self.named_path_list(base_name)
+		]
+
+	def path_list_recursive(self, base_name):
+		return [
+			fpath for fname, fpath in self.named_path_list(base_name, True)
+		]
+
+	@property
+	def matcher(self):
+		return MapPatternMatcher.from_cfg(self.cfg)
+
+	def find_group(self, base_name='', recursive=False):
+		collected_data = {map_name:None for map_name in self.cfg}
+
+		# map_name: rank of the pattern the current file was found with
+		found_ranks = {}
+
+		matcher = self.matcher
+		for fname, fpath in self.named_path_list(base_name, recursive):
+			for map_name, rank in matcher.classify(fname).items():
+				# Earlier pattern wins, then earlier file
+				if rank < found_ranks.get(map_name, rank + 1):
+					found_ranks[map_name] = rank
+					collected_data[map_name] = fpath
+
+		return collected_data
+
+	def find_all_groups(self, recursive=False):
+		"""
+			Partition the whole directory into material groups in one pass.
+			The base name of every file is derived by stripping the map
+			pattern the file was classified with (see
+			MapPatternMatcher.base_name), so that files sharing a base name
+			end up in the same group. Base names are case-insensitive.
+
+			Returns {base_name: collected_data}, where collected_data
+			has the same format as the result of find_group().
+			A file matching several maps is assigned to every one of them,
+			same as with find_group().
+		"""
+		# base_name_lower: base_name
+		base_names = {}
+		groups = {}
+		# base_name_lower: {map_name: pattern_rank}
+		found_ranks = {}
+
+		matcher = self.matcher
+		for fname, fpath in self.named_path_list('', recursive):
+			for map_name, rank in matcher.classify(fname).items():
+				base_name = matcher.base_name(fpath.name, map_name, rank)
+				base_key = base_name.lower()
+
+				if not base_key in groups:
+					base_names[base_key] = base_name
+					groups[base_key] = {map_name:None for map_name in self.cfg}
+					found_ranks[base_key] = {}
+
+				group_ranks = found_ranks[base_key]
+				if rank < group_ranks.get(map_name, rank + 1):
+					group_ranks[map_name] = rank
+					groups[base_key][map_name] = fpath
+
+		return {
+			base_names[base_key]: collected_data
+			for base_key, collected_data in groups.items()
+		}
+
+
+
+class FileLock:
+	"""
+		Cross-platform advisory lock, based on exclusive creation of
+		a lock file next to the target file.
+		Only respected by other FileLock users, not by Blender itself.
+
+		- tgt_file: The file to lock.
+		- timeout: Seconds to wait for the lock before giving up.
+		- stale_after: Locks older than this many seconds are considered
+		  left behind by a crashed process and are broken.
+	"""
+	def __init__(self, tgt_file, timeout=60.0, stale_after=120.0):
+		self.lock_file = Path(f'{tgt_file}.lock')
+		self.timeout = timeout
+		self.stale_after = stale_after
+		self._locked = False
+
+	def acquire(self):
+		deadline = time.monotonic() + self.timeout
+		while True:
+			try:
+				lock_fd = os.open(
+					self.lock_file,
+					os.O_CREAT | os.O_EXCL | os.O_WRONLY
+				)
+			except FileExistsError:
+				try:
+					lock_age = time.time() - os.stat(self.lock_file).st_mtime
+					if lock_age > self.stale_after:
+						print('Breaking stale lock', self.lock_file)
+						self.lock_file.unlink(missing_ok=True)
+						continue
+				except FileNotFoundError:
+					continue
+
+				if time.monotonic() > deadline:
+					raise TimeoutError(f'Unable to lock {self.lock_file}')
+
+				time.sleep(0.05)
+				continue
+
+			with os.fdopen(lock_fd, 'w') as lock_info:
+				lock_info.write(f'{socket.gethostname()}:{os.getpid()}')
+
+			self._locked = True
+			return self
+
+	def release(self):
+		if self._locked:
+			self.lock_file.unlink(missing_ok=True)
+			self._locked = False
+
+	def __enter__(self):
+		return self.acquire()
+
+	def __exit__(self, type, value, traceback):
+		self.release()
+
+
+
+class BlenderCatalogue:
+	"""
+		Direct blender catalogue manipulator.
+		Operates directly on "blender_assets.cats.txt" file.
+
+		Safe to use while other Blender instances and generators
+		modify the same file: saving happens under a FileLock and
+		if the file changed since it was parsed (mtime/size), external
+		changes are merged with local creates and deletes first,
+		instead of being overwritten.
+
+		- cat_file: Absolute path to "blender_assets.cats.txt"
+	"""
+
+	# Whether to also save the weird ~ file
+	SAVE_TILDE = False
+
+	# Some default data
+	CAT_FILE_HEADER = '\n'.join([
+		"""# This is an Asset Catalog Definition file for Blender.""",
+		"""#""",
+		"""# Empty lines and lines starting with `#` will be ignored.""",
+		"""# The first non-ignored line should be the version indicator.""",
+		'''# Other lines are of the format "UUID:catalog/path/for/assets:simple catalog name"''',
+		'',
+		'VERSION 1',
+		'',
+		# '7fac3db5-9567-4666-8cfd-67aa30932412:GN Modifiers:GN Modifiers',
+	])
+
+	def __init__(self, cat_file):
+		self.cat_file = Path(cat_file)
+
+		# Parsed .txt data
+		# uid: (cat_path, simple_name), in file order.
+		# Entries are unique by uid, paths may repeat
+		self._entries = None
+		# cat_path: uid of the first entry with this path
+		self._by_path = {}
+		# parent cat_path: {child cat_path, ...}. Top-level parent is ''
+		self._children = {}
+		# (mtime_ns, size) of the file when it was parsed
+		self._file_sig = None
+
+		# Local changes not written to the file yet, as uids
+		self._added = set()
+		self._deleted = set()
+
+		# Nesting depth of transaction()
+		self._batch_depth = 0
+		# Whether there are changes not written to the file yet
+		self._dirty = False
+
+	@staticmethod
+	def norm_path(cat_path):
+		return cat_path.strip(' /')
+
+	@staticmethod
+	def parent_path(cat_path):
+		return cat_path.rpartition('/')[0]
+
+	@classmethod
+	def lineage(cls, cat_path):
+		"""
+			"A/B/C" -> ["A", "A/B", "A/B/C"]
+		"""
+		segments = cat_path.split('/')
+		return [
+			'/'.join(segments[:seg_idx + 1])
+			for seg_idx in range(len(segments))
+		]
+
+	@staticmethod
+	def simple_name(cat_path):
+		return cat_path.replace('/', '-').replace(':', '-')
+
+	def file_sig(self):
+		try:
+			stat = os.stat(self.cat_file)
+		except FileNotFoundError:
+			return None
+
+		return (stat.st_mtime_ns, stat.st_size,)
+
+	@classmethod
+	def parse(cls, file_content):
+		"""
+			Returns a list of (uid, cat_path, simple_name).
+		"""
+		lines = [
+			l.strip() for l in file_content.split('\n')
+			if l.strip() and not l.strip().startswith('#')
+		]
+
+		# First line is always version identifier,
+		# which is useless here
+		if lines and lines[0].startswith('VERSION'):
+			del lines[0]
+
+		entries = []
+		for l in lines:
+			uid, cat_path, cat_path_id = l.split(':', 2)
+			entries.append((uid, cls.norm_path(cat_path), cat_path_id,))
+
+		return entries
+
+	def _index(self, entries):
+		self._entries = {}
+		self._by_path = {}
+		self._children = {}
+		for uid, cat_path, cat_path_id in entries:
+			self._add_entry(uid, cat_path, cat_path_id)
+
+	def _add_entry(self, uid, cat_path, cat_path_id):
+		self._entries[uid] = (cat_path, cat_path_id,)
+		self._by_path.setdefault(cat_path, uid)
+		self._children.setdefault(self.parent_path(cat_path), set()).add(cat_path)
+
+	def _remove_entries(self, uids):
+		"""
+			Remove entries in bulk and rebuild the path indexes once.
+		"""
+		remaining = [
+			(uid, cat_path, cat_path_id)
+			for uid, (cat_path, cat_path_id) in self._entries.items()
+			if not uid in uids
+		]
+		self._index(remaining)
+
+	def _load(self):
+		"""
+			Parse the file, unless it's already parsed and hasn't changed
+			since. The parsed state is pinned during transactions
+			and while there are unsaved changes.
+		"""
+		if self._entries is not None:
+			if self._batch_depth or self._dirty:
+				return
+			if self.file_sig() == self._file_sig:
+				return
+
+		self._file_sig = self.file_sig()
+		if self._file_sig is None:
+			self._index([])
+			return
+
+		self._index(self.parse(
+			self.cat_file.read_text(encoding='utf-8')
+		))
+
+	@property
+	def cat_list(self):
+		"""
+			{cat_path: (uid, simple_name)}
+		"""
+		self._load()
+
+		return {
+			cat_path: (uid, self._entries[uid][1],)
+			for cat_path, uid in self._by_path.items()
+		}
+
+	def uid(self, cat_path):
+		"""
+			UUID of the catalogue with the given path, or None.
+		"""
+		self._load()
+		return self._by_path.get(self.norm_path(cat_path))
+
+	def path(self, uid):
+		"""
+			Path of the catalogue with the given UUID, or None.
+		"""
+		self._load()
+		entry = self._entries.get(uid)
+		return entry[0] if entry else None
+
+	def children(self, cat_path=''):
+		"""
+			Paths of direct child catalogues. '' = top-level catalogues.
+		"""
+		self._load()
+		return sorted(self._children.get(self.norm_path(cat_path), ()))
+
+	@staticmethod
+	def write_atomic(tgt_path, text):
+		"""
+			Write text to a temp file next to the target, fsync it
+			and rename it over the target, so that a crash mid-write
+			never leaves a half-written file behind.
+		"""
+		tgt_path = Path(tgt_path)
+		tmp_path = tgt_path.with_name(f'{tgt_path.name}.{uuid.uuid4().hex}.tmp')
+
+		try:
+			with open(tmp_path, 'w', encoding='utf-8', newline='\n') as tmp_file:
+				tmp_file.write(text)
+				tmp_file.flush()
+				os.fsync(tmp_file.fileno())
+
+			os.replace(tmp_path, tgt_path)
+		finally:
+			tmp_path.unlink(missing_ok=True)
+
+		# Make the rename itself durable (not possible on Windows)
+		if hasattr(os, 'O_DIRECTORY'):
+			dir_fd = os.open(tgt_path.parent, os.O_RDONLY | os.O_DIRECTORY)
+			try:
+				os.fsync(dir_fd)
+			finally:
+				os.close(dir_fd)
+
+	def _merge_external(self):
+		"""
+			Re-read the file, if it was changed by someone else
+			since it was parsed, and apply local changes on top of it.
+		"""
+		file_sig = self.file_sig()
+		if file_sig == self._file_sig:
+			return
+
+		external = []
+		if file_sig is not None:
+			external = self.parse(self.cat_file.read_text(encoding='utf-8'))
+
+		external_uids = {uid for uid, cat_path, cat_path_id in external}
+
+		merged = [
+			entry for entry in external
+			if not entry[0] in self._deleted
+		]
+		merged.extend(
+			(uid, cat_path, cat_path_id)
+			for uid, (cat_path, cat_path_id) in self._entries.items()
+			if uid in self._added and not uid in external_uids
+		)
+
+		known_uids = set(self._entries) | self._deleted
+		print(
+			'Merging external changes to', self.cat_file, ':',
+			len(external_uids - known_uids), 'catalogues added,',
+			len(set(self._entries) - self._added - external_uids), 'removed'
+		)
+
+		self._index(merged)
+		self._file_sig = file_sig
+
+	def save(self):
+		self._load()
+
+		with FileLock(self.cat_file):
+			self._merge_external()
+			self._write()
+
+	def _write(self):
+		file_buf = [self.CAT_FILE_HEADER]
+		for uid, (cat_path, cat_path_id) in self._entries.items():
+			file_buf.append(':'.join([
+				uid, cat_path, cat_path_id
+			]))
+
+		self.write_atomic(self.cat_file, '\n'.join(file_buf))
+
+		if self.SAVE_TILDE:
+			self.write_atomic(
+				self.cat_file.parent / f'{self.cat_file.name}~',
+				'\n'.join(file_buf)
+			)
+
+		self._dirty = False
+		self._file_sig = self.file_sig()
+		self._added.clear()
+		self._deleted.clear()
+
+	def _changed(self):
+		"""
+			Called after every modification.
+			Writes immediately, unless inside a transaction.
+		"""
+		self._dirty = True
+		if not self._batch_depth:
+			self.save()
+
+	def flush(self):
+		"""
+			Write pending changes, if any.
+			Must be called before Blender reads the catalogue file.
+		"""
+		if self._dirty:
+			self.save()
+
+	@contextlib.contextmanager
+	def transaction(self):
+		"""
+			Collect creates and deletes and write the file once,
+			when the outermost transaction ends.
+			Changes are written even if the block raises,
+			since assets may already refer to the new catalogues.
+		"""
+		if not self._batch_depth:
+			self._load()
+
+		self._batch_depth += 1
+		try:
+			yield self
+		finally:
+			self._batch_depth -= 1
+			if not self._batch_depth:
+				self.flush()
+
+	def diff(self, cat_paths, scope=None):
+		"""
+			Compare the desired set of catalogue paths
+			(parents are implied) against the file.
+			- scope: Iterable of catalogue paths. Only existing catalogues
+			  at or under these are considered for removal.
+			  None = every existing catalogue.
+			Returns {'add': [cat_path, ...], 'remove': [cat_path, ...]}
+		"""
+		self._load()
+
+		desired = set()
+		for cat_path in cat_paths:
+			cat_path = self.norm_path(cat_path)
+			if cat_path:
+				desired.update(self.lineage(cat_path))
+
+		def in_scope(cat_path):
+			if scope is None:
+				return True
+			return any(
+				cat_path == scope_path or cat_path.startswith(scope_path + '/')
+				for scope_path in scope
+			)
+
+		return {
+			'add': sorted(desired - self._by_path.keys()),
+			'remove': sorted(
+				cat_path for cat_path in self._by_path.keys() - desired
+				if in_scope(cat_path)
+			),
+		}
+
+	def sync(self, cat_paths, scope=None, dry_run=False):
+		"""
+			Make the file contain exactly the desired catalogues
+			(within scope), by applying the minimal set of creates and
+			deletes in a single write. See diff().
+			- dry_run: Only compute and return the diff.
+			Returns the diff.
+		"""
+		with self.transaction():
+			cat_diff = self.diff(cat_paths, scope)
+			if dry_run:
+				return cat_diff
+
+			self.create_cats(cat_diff['add'])
+			self.del_cats(cat_diff['remove'])
+
+		return cat_diff
+
+	def create_cats(self, cat_paths):
+		"""
+			Create catalogues in bulk, including all of their missing
+			parents, with a single write of the file.
+			UUIDs are generated automatically.
+			Existing catalogues are not re-generated and are skipped.
+			Returns {cat_path: uid} for every requested path.
+		"""
+		uids = {}
+		with self.transaction():
+			for cat_path in cat_paths:
+				cat_path = self.norm_path(cat_path)
+				if not cat_path:
+					continue
+
+				for lineage_path in self.lineage(cat_path):
+					if lineage_path in self._by_path:
+						continue
+
+					uid = str(uuid.uuid4())
+					self._add_entry(
+						uid,
+						lineage_path,
+						self.simple_name(lineage_path)
+					)
+					self._added.add(uid)
+
+					# Every newly created catalogue must be written to the
+					# cats.txt file, otherwise Blender is too prone
+					# to crashing. Deferred until the transaction ends.
+					self._changed()
+
+				uids[cat_path] = self._by_path[cat_path]
+
+		return uids
+
+	def create_cat(self, cat_path):
+		"""
+			Create a catalogue and its missing parents.
+			UUID is generated automatically.
+			Duplicates are not re-generated and are skipped.
+			Returns UUID of the catalogue that was requested to be created.
+		"""
+		return self.create_cats([cat_path]).get(self.norm_path(cat_path))
+
+	def del_cats(self, cat_paths, recursive=False):
+		"""
+			Delete catalogues in bulk (every entry with these paths),
+			with a single pass over the entries.
+			- recursive: Also delete all of their child catalogues.
+		"""
+		self._load()
+
+		doomed_paths = {self.norm_path(cat_path) for cat_path in cat_paths}
+
+		def is_doomed(entry_path):
+			if entry_path in doomed_paths:
+				return True
+			if recursive:
+				return any(
+					lineage_path in doomed_paths
+					for lineage_path in self.lineage(entry_path)
+				)
+			return False
+
+		doomed = {
+			uid for uid, (entry_path, entry_id) in self._entries.items()
+			if is_doomed(entry_path)
+		}
+		if not doomed:
+			return
+
+		self._remove_entries(doomed)
+		for uid in doomed:
+			if uid in self._added:
+				self._added.discard(uid)
+			else:
+				self._deleted.add(uid)
+
+		self._changed()
+
+	def del_cat(self, cat_path, recursive=False):
+		"""
+			Delete a catalogue (every entry with this path).
+			- recursive: Also delete all of its child catalogues.
+		"""
+		self.del_cats([cat_path], recursive)
+
+
+
+class ImageIndex:
+	"""
+		Normalized absolute path to image datablock index,
+		built from bpy.data.images once per generation run and
+		kept up to date as images get loaded or removed through it.
+		Makes "is this file loaded already" an O(1) lookup.
+
+		In deferred mode, images are created pointing at the file
+		without opening it. Blender reads the file the first time
+		the image is actually used (e.g. drawn or rendered).
+	"""
+	# Files Blender loads as float buffers, which get a linear
+	# colorspace by default
+	FLOAT_EXTS = ('.exr', '.hdr',)
+
+	def __init__(self, deferred=False):
+		# norm_path: bpy.types.Image
+		self._images = None
+		self.deferred = deferred
+		self._linear_colorspace = None
+
+	@staticmethod
+	def norm_path(img_path):
+		return os.path.normcase(os.path.normpath(
+			bpy.path.abspath(str(img_path))
+		))
+
+	@property
+	def images(self):
+		if self._images is not None:
+			return self._images
+
+		self._images = {}
+		for img in bpy.data.images:
+			if img.filepath:
+				self._images.setdefault(self.norm_path(img.filepath), img)
+
+		return self._images
+
+	def get(self, img_path):
+		"""
+			Image datablock loaded from the given path, or None.
+		"""
+		img_key = self.norm_path(img_path)
+		img = self.images.get(img_key)
+		if img is None:
+			return None
+
+		# The datablock may have been removed or repointed behind our back
+		try:
+			if self.norm_path(img.filepath) == img_key:
+				return img
+		except ReferenceError:
+			pass
+
+		del self.images[img_key]
+
+		return None
+
+	def add(self, img):
+		self.images.setdefault(self.norm_path(img.filepath), img)
+
+	def load(self, img_path):
+		if self.deferred:
+			img = self.create_unloaded(img_path)
+		else:
+			img = bpy.data.images.load(str(img_path))
+
+		self.add(img)
+		return img
+
+	@property
+	def linear_colorspace(self):
+		if self._linear_colorspace:
+			return self._linear_colorspace
+
+		# Blender 4.0 renamed "Linear" to "Linear Rec.709"
+		img = bpy.data.images.new('.wzrd_colorspace_probe', 1, 1)
+		try:
+			colorspaces = img.colorspace_settings.bl_rna.properties['name'].enum_items.keys()
+		finally:
+			bpy.data.images.remove(img)
+
+		if 'Linear Rec.709' in colorspaces:
+			self._linear_colorspace = 'Linear Rec.709'
+		else:
+			self._linear_colorspace = 'Linear'
+
+		return self._linear_colorspace
+
+	def create_unloaded(self, img_path):
+		"""
+			Create an image datablock pointing at the given file,
+			without reading the file.
+		"""
+		img_path = Path(img_path)
+
+		img = bpy.data.images.new(img_path.name, 1, 1, alpha=True)
+		img.source = 'FILE'
+		img.filepath = str(img_path)
+
+		# images.load() would pick this from the file
+		if img_path.suffix.lower() in self.FLOAT_EXTS:
+			img.colorspace_settings.name = self.linear_colorspace
+
+		return img
+
+	def reload(self, img_paths):
+		"""
+			Re-read the images loaded from any of the given paths,
+			e.g. after the files have been modified.
+			Returns the amount of reloaded images.
+		"""
+		reloaded = 0
+		for img_path in img_paths:
+			img = self.get(img_path)
+			if img is None:
+				continue
+
+			img.reload()
+			reloaded += 1
+
+		return reloaded
+
+	def remove(self, img):
+		img_key = self.norm_path(img.filepath)
+		if self.images.get(img_key) == img:
+			del self.images[img_key]
+
+		bpy.data.images.remove(img)
+
+
+
+# Pro tip: Bump node is shit.
+# Pro tip: Displacement node's "Normal" input is rather different from
+# the shader's "Normal" input.
+class ImageBasedAsset:
+	NODE_LOCS = {
+		'shader':                 (0.0, 0.0),
+		'mat_out':                (524.969, -226.546),
+		'albedo':                 (-724.768, 794.767),
+		'albedo_ao_mix':          (-375.595, 771.867),
+		'ao':                     (-724.768, 511.072),
+		'displacement':           (-40.203, -542.172),
+		'displacement_data_node': (230.033, -542.131),
+		'normal_map':             (-724.768, -624.73),
+		'normal_map_data_node':   (-439.843, -523.823),
+		'roughness':              (-724.768, -57.549),
+		'gloss_invert':           (-446.403, -57.549),
+		'metallic':               (-724.768, 229.464),
+		'alpha':                  (-724.768, -340.217),
+		'emission_col':           (-724.768, -916.083),
+		'emission_fac':           (-724.768, -1203.0),
+	}
+
+	# Shared by all assets of a generation run
+	image_index = ImageIndex()
+
+	# Whether to build materials by copying a template material
+	# with the same signature (see signature), instead of building
+	# the node graph from scratch every time
+	use_templates = True
+
+	# signature: template bpy.types.Material
+	_templates = {}
+
+	# Image texture node names, per map role
+	IMAGE_NODE_PREFIX = 'wzrd_img_'
+
+	# role: (colorspace or None to keep the default, allow_duplicate)
+	IMAGE_ROLES = {
+		'albedo':       (None, False,),
+		'ao':           (None, False,),
+		'normal':       ('Non-Color', False,),
+		'bump':         ('Non-Color', False,),
+		'rough':        ('Non-Color', False,),
+		'metal':        ('Non-Color', False,),
+		'emission':     (None, False,),
+		'emission_fac': (None, False,),
+		# New image for alpha channel is always created
+		'alpha':        ('Non-Color', True,),
+	}
+
+	def __init__(self, input_data):
+		# self.input_data = AssetBaseData.defaults_all | input_data
+		self.input_data = input_data
+
+		# Getting datablock triggers entire material to be setup
+		self._datablock = None
+		# Getting material simply triggers a creation of empty material
+		# with minimal contents, such as Principled BSDF and Material Output
+		self._material = None
+		# Whether the material is a copy of a template,
+		# which already has the full node graph
+		self._from_template = False
+		# SourceFingerprint of the input data, stored in the material
+		self.fingerprint = None
+
+		# This material's "Principled BSDF" node
+		self._bsdf_node = None
+		# This material's "Material Output" node
+		self._mat_output_node = None
+
+	@property
+	def signature(self):
+		"""
+			Everything that affects the layout of the node graph.
+			Materials with the same signature only differ by images.
+		"""
+		input_data = self.input_data
+		if input_data['asset_type'] in ('brush', 'texture'):
+			return (input_data['asset_type'],)
+
+		alpha_link = None
+		if input_data['alpha']:
+			alpha_link = 'alpha' if str(input_data['alpha']) == '$from_albedo' else 'color'
+
+		rough_gloss = None
+		if input_data['rough']:
+			rough_gloss = 'rough'
+		elif input_data['gloss']:
+			rough_gloss = 'gloss'
+
+		return (
+			input_data['asset_type'],
+			*(
+				bool(input_data[map_name]) for map_name in
+				('albedo', 'ao', 'normal', 'bump', 'metal', 'emission', 'emission_fac',)
+			),
+			rough_gloss,
+			alpha_link,
+			'alpha' in input_data['disconnected'],
+		)
+
+	@staticmethod
+	def new_empty_material(mat_name):
+		mat = bpy.data.materials.new(
+			name=mat_name
+		)
+		if hasattr(mat, 'use_nodes'):
+			mat.use_nodes = True
+
+		mat.node_tree.nodes.clear()
+
+		return mat
+
+	@classmethod
+	def template(cls, asset):
+		"""
+			Template material for the signature of the given asset.
+			Built on first request.
+		"""
+		signature = asset.signature
+		template_mat = cls._templates.get(signature)
+		if template_mat:
+			try:
+				template_mat.name
+				return template_mat
+			except ReferenceError:
+				pass
+
+		builder = cls(asset.input_data)
+		builder._material = cls.new_empty_material(
+			f'.wzrd_template_{len(cls._templates)}'
+		)
+		builder.build_node_graph()
+
+		cls._templates[signature] = builder._material
+
+		return builder._material
+
+	@classmethod
+	def clear_templates(cls):
+		for template_mat in cls._templates.values():
+			try:
+				bpy.data.materials.remove(template_mat)
+			except ReferenceError:
+				pass
+
+		cls._templates.clear()
+
+	@property
+	def material(self):
+		if self._material:
+			return self._material
+
+		mat_name = self.input_data['mat_name'].split('/')[-1]
+
+		if mat_name in bpy.data.materials:
+			bpy.data.materials.remove(
+				bpy.data.materials[mat_name]
+			)
+
+		if self.use_templates:
+			mat = self.template(self).copy()
+			mat.name = mat_name
+			self._from_template = True
+		else:
+			mat = self.new_empty_material(mat_name)
+
+		wzrd_asset_data = {
+			'asset_type': self.input_data['asset_type'],
+			'source': str(self.input_data['import_source']),
+			'maps': AssetBaseData.defaults_maps,
+		}
+
+		for map_name in AssetBaseData.defaults_maps.keys():
+			target_map = self.input_data[map_name]
+			if target_map and (target_map != 'None'):
+				wzrd_asset_data['maps'][map_name] = str(target_map)
+
+		if self.fingerprint:
+			wzrd_asset_data['fingerprint'] = self.fingerprint
+
+		mat['_wzrd_asset_data'] = wzrd_asset_data
+
+		self._material = mat
+
+		return mat
+
+	@property
+	def node_tree(self):
+		return self.material.node_tree
+
+	@property
+	def mat_output_node(self):
+		if self._mat_output_node:
+			return self._mat_output_node
+
+		self._mat_output_node = self.node_tree.nodes.new(
+			type='ShaderNodeOutputMaterial'
+		)
+
+		return self._mat_output_node
+
+	@property
+	def bsdf_node(self):
+		if self._bsdf_node:
+			return self._bsdf_node
+
+		nodes = self.node_tree.nodes
+		links = self.node_tree.links
+
+		main_bsdf_node = nodes.new(type='ShaderNodeBsdfPrincipled')
+		mat_output_node = self.mat_output_node
+
+		main_bsdf_node.location = (0, 0)
+		mat_output_node.location = (300, 0)
+
+		links.new(
+			main_bsdf_node.outputs['BSDF'],
+			mat_output_node.inputs['Surface']
+		)
+
+		self._bsdf_node = main_bsdf_node
+
+		return self._bsdf_node
+
+	@property
+	def datablock(self):
+		if self._datablock:
+			return self._datablock
+
+		self._datablock = self.create_datablock()
+
+		return self._datablock
+
+	def load_image(self, tgt_image_path, premul_alpha=False, allow_duplicate=False):
+		image_datablock = None
+		if not allow_duplicate:
+			image_datablock = self.image_index.get(tgt_image_path)
+
+		if not image_datablock:
+			image_datablock = self.image_index.load(tgt_image_path)
+
+		if premul_alpha:
+			image_datablock.alpha_mode = 'PREMUL'
+		else:
+			image_datablock.alpha_mode = 'CHANNEL_PACKED'
+
+		return image_datablock
+
+	def create_image_node(
+		self,
+		tgt_image_path,
+		premul_alpha=False,
+		allow_duplicate=False
+	):
+		img_tex_node = self.node_tree.nodes.new(type='ShaderNodeTexImage')
+
+		img_tex_node.image = self.load_image(
+			tgt_image_path,
+			premul_alpha,
+			allow_duplicate
+		)
+
+		return img_tex_node
+
+	def create_role_node(self, role):
+		"""
+			Create an empty image texture node for a map role.
+			The image is assigned later by assign_images().
+		"""
+		img_tex_node = self.node_tree.nodes.new(type='ShaderNodeTexImage')
+		img_tex_node.name = self.IMAGE_NODE_PREFIX + role
+		img_tex_node.label = role
+
+		return img_tex_node
+
+	def image_sources(self):
+		"""
+			{role: image path} of every map role used by this asset.
+		"""
+		input_data = self.input_data
+		if input_data['asset_type'] in ('brush', 'texture'):
+			return {'albedo': input_data['albedo']}
+
+		sources = {
+			role: input_data[role]
+			for role in ('albedo', 'ao', 'normal', 'bump', 'metal', 'emission', 'emission_fac',)
+		}
+		sources['rough'] = input_data['rough'] or input_data['gloss']
+
+		# From albedo = same file as albedo
+		if input_data['alpha'] and '$from_albedo' in str(input_data['alpha']):
+			sources['alpha'] = input_data['albedo']
+		else:
+			sources['alpha'] = input_data['alpha']
+
+		return sources
+
+	def assign_images(self):
+		nodes = self.node_tree.nodes
+		for role, img_path in self.image_sources().items():
+			img_tex_node = nodes.get(self.IMAGE_NODE_PREFIX + role)
+			if not img_tex_node or not img_path:
+				continue
+
+			colorspace, allow_duplicate = self.IMAGE_ROLES[role]
+			img_tex_node.image = self.load_image(
+				img_path,
+				allow_duplicate=allow_duplicate
+			)
+			if colorspace:
+				img_tex_node.image.colorspace_settings.name = colorspace
+
+	def create_datablock(self):
+		self.material['_asset_wzrd_import_src'] = str(
+			self.input_data['import_source']
+		)
+
+		if not self._from_template:
+			self.build_node_graph()
+
+		self.assign_images()
+
+		return self._material
+
+	def build_node_graph(self):
+		"""
+			Create all nodes and links of the material.
+			Image texture nodes are left empty, see assign_images().
+		"""
 		# If it's just a brush or a single texture - simply create a single
 		# texture node and that's it
 		if self.input_data['asset_type'] in ('brush', 'texture'):
-			self.create_image_node(self.input_data['albedo'])
-			return self._material
+			self.create_role_node('albedo')
+			return
+
+		# Otherwise - setup a material
+
+		# 
+		# Albedo + AO
+		# 
+		if self.input_data['albedo']:
+			albedo_img_node = self.create_role_node('albedo')
+			albedo_img_node.location = self.NODE_LOCS['ao']
+			# AO
+			if self.input_data['ao']:
+				albedo_img_node.location = self.NODE_LOCS['albedo']
+				ao_img_node = self.create_role_node('ao')
+				ao_img_node.location = self.NODE_LOCS['ao']
+
+				col_mix_node = self.node_tree.nodes.new(
+					type='ShaderNodeMix'
+				)
+				col_mix_node.location = self.NODE_LOCS['albedo_ao_mix']
+				col_mix_node.data_type = 'RGBA'
+				col_mix_node.inputs['Factor'].default_value = 1.0
+				col_mix_node.blend_type = 'MULTIPLY'
+
+				self.node_tree.links.new(
+					ao_img_node.outputs['Color'],
+					col_mix_node.inputs['B']
+				)
+
+				self.node_tree.links.new(
+					albedo_img_node.outputs['Color'],
+					col_mix_node.inputs['A']
+				)
+
+
+				self.node_tree.links.new(
+					col_mix_node.outputs['Result'],
+					self.bsdf_node.inputs['Base Color']
+				)
+			else:
+				self.node_tree.links.new(
+					albedo_img_node.outputs['Color'],
+					self.bsdf_node.inputs['Base Color']
+				)
+
+		# 
+		# Normal + BW disp
+		# 
+		if self.input_data['normal']:
+			normal_map_img_node = self.create_role_node('normal')
+			normal_map_img_node.location = self.NODE_LOCS['normal_map']
+			normal_map_data_node = self.node_tree.nodes.new(
+				type='ShaderNodeNormalMap'
+			)
+			normal_map_data_node.location = self.NODE_LOCS['normal_map_data_node']
+			self.node_tree.links.new(
+				normal_map_img_node.outputs['Color'],
+				normal_map_data_node.inputs['Color']
+			)
+			self.node_tree.links.new(
+				normal_map_data_node.outputs['Normal'],
+				self.bsdf_node.inputs['Normal']
+			)
+
+		if self.input_data['bump']:
+			bump_img_node = self.create_role_node('bump')
+			bump_img_node.location = self.NODE_LOCS['displacement']
+			disp_node = self.node_tree.nodes.new(
+				type='ShaderNodeDisplacement'
+			)
+			disp_node.location = self.NODE_LOCS['displacement_data_node']
+			self.node_tree.links.new(
+				bump_img_node.outputs['Color'],
+				disp_node.inputs['Height']
+			)
+			self.node_tree.links.new(
+				disp_node.outputs['Displacement'],
+				self.mat_output_node.inputs['Displacement']
+			)
+
+		# 
+		# Rough/Gloss
+		# 
+		if self.input_data['rough'] or self.input_data['gloss']:
+			rg_img_node = self.create_role_node('rough')
+			rg_img_node.location = self.NODE_LOCS['roughness']
+
+			if self.input_data['gloss'] and not self.input_data['rough']:
+				invert_node = self.node_tree.nodes.new(
+					type='ShaderNodeInvert'
+				)
+				invert_node.location = self.NODE_LOCS['gloss_invert']
+				self.node_tree.links.new(
+					rg_img_node.outputs['Color'],
+					invert_node.inputs['Color']
+				)
+				self.node_tree.links.new(
+					invert_node.outputs['Color'],
+					self.bsdf_node.inputs['Roughness']
+				)
+			else:
+				self.node_tree.links.new(
+					rg_img_node.outputs['Color'],
+					self.bsdf_node.inputs['Roughness']
+				)
+
+		# 
+		# Metal
+		# 
+		if self.input_data['metal']:
+			metal_img_node = self.create_role_node('metal')
+			metal_img_node.location = self.NODE_LOCS['metallic']
+			self.node_tree.links.new(
+				metal_img_node.outputs['Color'],
+				self.bsdf_node.inputs['Metallic']
+			)
+
+		# 
+		# Emission
+		# 
+		if self.input_data['emission']:
+			emit_img_node = self.create_role_node('emission')
+			emit_img_node.location = self.NODE_LOCS['emission_col']
+			self.node_tree.links.new(
+				emit_img_node.outputs['Color'],
+				self.bsdf_node.inputs['Emission Color']
+			)
+			if self.input_data['emission_fac']:
+				emit_fac_img_node = self.create_role_node('emission_fac')
+				emit_fac_img_node.location = self.NODE_LOCS['emission_fac']
+			else:
+				emit_fac_img_node = emit_img_node
+
+			self.node_tree.links.new(
+				emit_fac_img_node.outputs['Color'],
+				self.bsdf_node.inputs['Emission Strength']
+			)
+
+		# 
+		# Alpha
+		# 
+		if self.input_data['alpha']:
+			alpha_source = str(self.input_data['alpha'])
+
+			alpha_img_node = self.create_role_node('alpha')
+			alpha_img_node.location = self.NODE_LOCS['alpha']
+
+			# Decide how to connect the node to the alpha input
+			alpha_link = None
+			if alpha_source == '$from_albedo_rgb':
+				alpha_link = self.node_tree.links.new(
+					alpha_img_node.outputs['Color'],
+					self.bsdf_node.inputs['Alpha']
+				)
+			elif alpha_source == '$from_albedo':
+				# From albedo alpha channel
+				alpha_link = self.node_tree.links.new(
+					alpha_img_node.outputs['Alpha'],
+					self.bsdf_node.inputs['Alpha']
+				)
+			else:
+				# Dedicated alpha mask
+				alpha_link = self.node_tree.links.new(
+					alpha_img_node.outputs['Color'],
+					self.bsdf_node.inputs['Alpha']
+				)
+
+			if 'alpha' in self.input_data['disconnected'] and alpha_link:
+				self.node_tree.links.remove(alpha_link)
+
+
+
+class ImageBasedAssetPreview:
+	def __init__(self, parent_asset):
+		self.asset = parent_asset
+		self.raw_path = self.asset.input_data['preview']
+		self.cooked_path = None
+		self.crop_params = self.asset.input_data['pre_crop_data']
+		self.done = False
+
+	@property
+	def eligible(self):
+		if not self.raw_path:
+			return False
+		
+		if not Path(self.raw_path).is_file():
+			return False
+
+		return True
+
+	def generate_cooked_path(self):
+		return BLEND_FILE.parent / f'pwzrd_cooked_{str(uuid.uuid4())}.png'
+
+	def cook(self, tgt_img=None, crop_params=None):
+		if not self.raw_path and not tgt_img:
+			return False
+
+		if tgt_img:
+			self.raw_path = tgt_img
+
+		if crop_params:
+			self.crop_params = crop_params
+
+		intermediate = []
+
+		tgt_img = Path(self.raw_path)
+		img_write_path = self.generate_cooked_path()
+
+		if self.crop_params:
+			p = self.crop_params
+			crop_str = ''.join([
+				# Crop
+				'in_w*', str(p['crop_w']),
+				':',
+				'in_h*', str(p['crop_h']),
+				':',
+				# Center
+				'in_w*', str(p['center_w']),
+				':',
+				'in_h*', str(p['center_h']),
+			])
+			subprocess.call(
+				[
+					str(FFMPEG),
+					'-y',
+					'-loglevel', 'quiet',
+					'-i', str(tgt_img),
+					'-vf', f'crop={crop_str}',
+					str(img_write_path)
+				],
+				shell=True,
+				stdout=subprocess.DEVNULL
+			)
+
+			if not img_write_path.is_file():
+				return False
+
+			intermediate.append(img_write_path)
+
+			tgt_img = img_write_path
+			img_write_path = self.generate_cooked_path()
+
+		subprocess.call(
+			[
+				str(FFMPEG),
+				'-y',
+				'-loglevel', 'quiet',
+				'-i', str(tgt_img),
+				'-vf', f'scale={PREVIEW_RESOLUTION}:-1',
+				'-qscale:v', str(PREVIEW_QUALITY),
+				str(img_write_path)
+			],
+			shell=True,
+			stdout=subprocess.DEVNULL
+		)
+
+		while intermediate:
+			intermediate.pop().unlink(missing_ok=True)
+
+		if not img_write_path.is_file():
+			return False
+
+		self.cooked_path = img_write_path
+		return True
+
+	def apply(self, del_source=False):
+		if not self.cooked_path:
+			return False
+
+		context = bpy.context
+		override = context.copy()
+		override['id'] = self.asset.asset_data
+		with context.temp_override(**override):
+			bpy.ops.ed.lib_id_load_custom_preview(
+				filepath=str(self.cooked_path)
+			)
+
+		# Unchanged materials keep their previews on regeneration
+		self.asset.asset_data['_wzrd_asset_data']['has_preview'] = True
+
+		self.done = True
+		self.cooked_path.unlink(missing_ok=True)
+		self.cooked_path = None
+
+		if del_source and self.raw_path:
+			Path(self.raw_path).unlink(missing_ok=True)
+			self.raw_path = None
+
+		return True
+
+
+
+class ImageBasedAssetCatalogueItem:
+	def __init__(self, parent_cat, input_data):
+		self.parent_cat = parent_cat
+		self.input_data = AssetBaseData.defaults_all | input_data
+		self.img_asset = ImageBasedAsset(self.input_data)
+
+		self._asset_data = None
+
+		self._cat_uid = None
+
+		self.preview = ImageBasedAssetPreview(self)
+
+	# Calling this will only return the underlying material
+	# datablock regardless of whether it's registered in the asset catalogue
+	# or not
+	@property
+	def datablock(self):
+		return self.img_asset.datablock
+	
+	def validate(self):
+		for map_name in AssetBaseData.defaults_maps.keys():
+			if self.input_data.get(map_name):
+				return True
+
+		return False
+
+	# Getting this triggers everything to be registered
+	# Returns underlying material datablock, but in registered state
+	@property
+	def asset_data(self):
+		if self._asset_data:
+			return self._asset_data
+
+		self.reg()
+
+		return self._asset_data
+
+	# Path of the catalogue this asset belongs to
+	@property
+	def cat_path(self):
+		return (
+			self.input_data['category'].strip(' /') + '/' +
+			'/'.join(self.input_data['mat_name'].split('/')[:-1])
+		)
+
+	# Simply create a catalogue in the txt file
+	def create_cat(self):
+		return self.parent_cat.create_cat(self.cat_path)
+
+	# Basically same as create_cat()
+	@property
+	def cat_uid(self):
+		if self._cat_uid:
+			return self._cat_uid
+
+		self._cat_uid = self.create_cat()
+
+		return self._cat_uid
+
+	# Use an already generated and registered material,
+	# instead of creating a new one
+	def adopt(self, mat):
+		self.img_asset._material = mat
+		self.img_asset._datablock = mat
+		self._asset_data = mat
+
+	# Register the asset in the catalogue
+	def reg(self):
+		self.datablock.asset_mark()
+		self.datablock.asset_data.catalog_id = self.cat_uid
+		for tag in self.input_data['tags']:
+			self.datablock.asset_data.tags.new(
+				tag,
+				skip_if_exists=True
+			)
+
+		self.datablock.asset_data.tags.new(
+			f"""${self.input_data['asset_type']}""",
+			skip_if_exists=True
+		)
+
+		self._asset_data = self.datablock
+
+
+def confirm(msg='Proceed?'):
+	assert (input(msg).lower() != 'n')
+
+
+class GenerationJournal:
+	"""
+		Append-only per-asset progress journal of a generation run,
+		so that a run, which died half way, can skip finished work
+		when restarted.
+
+		The journal is a JSON lines file of
+		{"asset": asset_key, "stage": stage, "data": data}
+		Assets are keyed by a digest of their full asset info,
+		so that changed assets are never skipped.
+
+		Stages only count once the blend file containing their
+		results is saved. Therefore, records are held back until
+		commit(), which SaveCheckpoint calls after every save.
+		Records of stages, whose results live outside the blend file
+		(e.g. cooked preview images) can be written immediately.
+
+		- journal_path: Absolute path of the journal file.
+		  None = don't keep a journal.
+	"""
+	STAGES = (
+		'created',
+		'registered',
+		'preview_cooked',
+		'preview_applied',
+		'preview_rendered',
+	)
+
+	def __init__(self, journal_path):
+		self.journal_path = Path(journal_path) if journal_path else None
+
+		# asset_key: {stage: data}
+		self._done = None
+		# Records not written yet
+		self._pending = []
+
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def asset_key(asset_info):
+		return hashlib.blake2b(
+			json.dumps(asset_info, sort_keys=True, default=str).encode(),
+			digest_size=16
+		).hexdigest()
+
+	@property
+	def done(self):
+		if self._done is not None:
+			return self._done
+
+		self._done = {}
+		if not self.journal_path or not self.journal_path.is_file():
+			return self._done
+
+		with open(self.journal_path, encoding='utf-8') as journal_file:
+			for line in journal_file:
+				try:
+					record = json.loads(line)
+				except json.JSONDecodeError:
+					# The last line may be cut short by a crash
+					continue
+
+				self._done.setdefault(record['asset'], {})[record['stage']] = record['data']
+
+		if self._done:
+			print('Resuming generation for', len(self._done), 'journaled assets')
+
+		return self._done
+
+	def stages(self, asset_info):
+		"""
+			{stage: data} of every committed stage of the asset.
+		"""
+		return self.done.get(self.asset_key(asset_info), {})
+
+	def record(self, asset_info, stage, data=None, immediate=False):
+		"""
+			Record a finished stage of an asset.
+			- immediate: Write right away, because the stage's results
+			  don't depend on the blend file being saved.
+		"""
+		if not self.journal_path:
+			return
+
+		record = {
+			'asset': self.asset_key(asset_info),
+			'stage': stage,
+			'data': data,
+		}
+		with self._lock:
+			if immediate:
+				self._write([record])
+			else:
+				self._pending.append(record)
+
+	def commit(self):
+		"""
+			Write held back records. Call after every save.
+		"""
+		with self._lock:
+			if self._pending:
+				self._write(self._pending)
+				self._pending.clear()
+
+	def _write(self, records):
+		self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+		with open(self.journal_path, 'a+b') as journal_file:
+			# A crash may have cut the last line short
+			if journal_file.tell():
+				journal_file.seek(-1, os.SEEK_END)
+				if journal_file.read(1) != b'\n':
+					journal_file.write(b'\n')
+
+			for record in records:
+				journal_file.write((json.dumps(record) + '\n').encode())
+				self.done.setdefault(record['asset'], {})[record['stage']] = record['data']
+
+			journal_file.flush()
+			os.fsync(journal_file.fileno())
+
+	def finish(self):
+		"""
+			The run completed, next run starts from scratch.
+		"""
+		with self._lock:
+			self._pending.clear()
+			self._done = {}
+
+			if self.journal_path:
+				self.journal_path.unlink(missing_ok=True)
+
+
+class SaveCheckpoint:
+	"""
+		Decides when the blend file gets saved during generation,
+		trading durability against throughput.
+		Every save is timed.
+
+		- policy:
+		  stage = save at the end of every stage of the run
+		  (registration, rendering previews), which processed
+		  any assets (the default).
+		  assets = save once every_assets assets were processed
+		  since the last save, including in the middle of a stage.
+		  seconds = save once every_seconds passed since the last save,
+		  if anything was processed in the meantime.
+		  end = only save at the end of the run.
+		- journal: GenerationJournal to commit after every save.
+		  The journal only counts saved work. Therefore, with a journal
+		  kept, stage and end also save every every_assets assets.
+	"""
+	POLICIES = ('stage', 'assets', 'seconds', 'end',)
+
+	def __init__(self, policy='stage', every_assets=500, every_seconds=300.0, journal=None):
+		if not policy in self.POLICIES:
+			raise ValueError(
+				f'Invalid save policy: {policy}. Must be one of {self.POLICIES}'
+			)
+
+		# Otherwise every single asset would trigger a save
+		if every_assets <= 0:
+			raise ValueError(
+				f'Invalid save_every_assets: {every_assets}. Must be positive'
+			)
+		if every_seconds <= 0:
+			raise ValueError(
+				f'Invalid save_every_seconds: {every_seconds}. Must be positive'
+			)
+
+		self.policy = policy
+		self.every_assets = every_assets
+		self.every_seconds = every_seconds
+		# GenerationJournal to commit after every save
+		self.journal = journal
+
+		# Amount of assets processed since the last save
+		self.pending = 0
+		self._last_save = time.monotonic()
+
+		# [(reason, seconds), ...]
+		self.save_times = []
+
+	@property
+	def journaled(self):
+		return bool(self.journal and self.journal.journal_path)
+
+	@property
+	def due(self):
+		if not self.pending:
+			return False
+
+		if self.policy == 'seconds':
+			return (time.monotonic() - self._last_save) >= self.every_seconds
+
+		if self.policy == 'assets' or self.journaled:
+			return self.pending >= self.every_assets
+
+		return False
+
+	def progress(self, amount=1):
+		"""
+			Record processed assets and save, if due.
+		"""
+		self.pending += amount
+		if self.due:
+			self.save('checkpoint')
+
+	def stage_end(self, stage, force=False):
+		"""
+			Called at the end of every stage.
+			- force: Save regardless of the policy,
+			  because the next stage needs the file saved.
+		"""
+		if force or (self.policy == 'stage' and self.pending) or self.due:
+			self.save(stage)
+
+	def save(self, reason):
+		save_start = time.perf_counter()
+		bpy.ops.wm.save_mainfile()
+		save_time = time.perf_counter() - save_start
+
+		if self.journal:
+			self.journal.commit()
+
+		self.save_times.append((reason, save_time,))
+		print(
+			'Saved blend file', f'({reason}, {self.pending} assets)',
+			'in', f'{save_time:.2f}s'
+		)
+
+		self.pending = 0
+		self._last_save = time.monotonic()
+
+	def summary(self):
+		total_time = sum(save_time for reason, save_time in self.save_times)
+		print(
+			'Saved blend file', len(self.save_times), 'times,',
+			'taking', f'{total_time:.2f}s', 'in total'
+		)
+
+
+class AssetWizard:
+	"""
+		Config syntax is as follows:
+		    key = value
+		    key = value
+		    ...
+		Values can have "=" symbols in them, but not keys.
+		Key Value pairs are separated by line breaks.
+
+		"asset_wzrd_cfg" text datablock accepts following keys:
+		- yield_group:
+		  Comma-separated yield groups.
+		  $all = accept all groups.
+		  Workers declaring YIELD_CATEGORIES (see WorkerManifest)
+		  that don't intersect with the yield group are skipped entirely.
+
+		- worker_index:
+		  Absolute path pointing to a python file, containing workers to be
+		  executed. Must not have quotation marks
+
+		- cat_file:
+		  Absolute path pointing to the cats.txt file.
+
+		- pregen_index:
+		  Pregenerated index path. Traversal results are stored there
+		  per worker and reused as long as the worker's source code and
+		  library trees stay the same. See WorkerResultIndex.
+
+		- scan_cache:
+		  Absolute path to the persistent directory scan cache
+		  (sqlite database). Default to "scan_cache.sqlite" in the addon's
+		  appdata folder. $none = don't persist directory listings.
+
+		- scan_threads:
+		  Max amount of directories listed concurrently when walking
+		  library trees. Default to 8. 1 = list sequentially.
+
+		- traverse_mode:
+		  threads = run workers in threads of this Blender process. Default.
+		  processes = run workers in separate Python processes
+		  (Blender's own interpreter, without bpy), so that worker logic
+		  runs in parallel. Worker index modules must not import bpy
+		  in this mode.
+
+		- traverse_processes:
+		  Max amount of concurrent traversal processes.
+		  Default to the amount of CPU cores.
+
+		- traverse_per_device:
+		  Max amount of workers traversing the same device
+		  (physical disk or network host) concurrently. Default to 1.
+
+		- preview_per_device:
+		  Max amount of previews cooked concurrently per device.
+		  Default to 10.
+
+		- traversal_report:
+		  Absolute path of the JSON traversal report, listing wall time,
+		  pregen index fingerprinting time, directories listed,
+		  files examined, assets yielded and skipped
+		  per worker. Default to "traversal_report.json" in the addon's
+		  appdata folder. $none = don't write the report.
+
+		- dedup:
+		  1 = detect materials whose maps have identical contents
+		  (across libraries and vendors) and only generate one of them:
+		  the one with the smallest mat_name (then import_source).
+		  Materials of the other copies, left by earlier runs, are removed.
+		  Generation starts once the traversal is complete.
+		  0 = disabled. Default to 0.
+
+		- dedup_per_device:
+		  Max amount of files hashed concurrently per device. Default to 4.
+
+		- dedup_report:
+		  Absolute path of the JSON report listing merged duplicates.
+		  Default to "dedup_report.json" in the addon's appdata folder.
+		  $none = don't write the report.
+
+		- cat_sync:
+		  1 = after generation, remove catalogues which no generated
+		  asset belongs to anymore, in a single write of the cats file.
+		  dry = only report what would change. 0 = disabled. Default to 0.
+		  Only happens when all workers are allowed and actually ran
+		  (none was skipped, e.g. for missing roots) and yield_group
+		  is $all.
+
+		- cat_sync_scope:
+		  Comma-separated catalogue paths. Only catalogues at or under
+		  these are ever removed by cat_sync.
+		  $auto = top-level categories of the generated assets. Default.
+		  $all = every catalogue in the file.
+
+		- cat_sync_report:
+		  Absolute path of the JSON catalogue sync report.
+		  Default to "cat_sync_report.json" in the addon's appdata folder.
+		  $none = don't write the report.
+
+		- material_templates:
+		  1 = build the node graph once per combination of present maps
+		  and copy it for every material with the same combination,
+		  only assigning the images. 0 = build every material from scratch.
+		  Default to 1.
+
+		- deferred_images:
+		  1 = create image datablocks pointing at the map files
+		  without opening them. Blender reads the files once
+		  the materials are used or previewed.
+		  0 = load every image during generation. Default to 0.
+
+		- stream_chunk:
+		  Amount of assets registered in Blender at once, while
+		  the traversal is still running. Default to 512.
+
+		- stream_queue:
+		  Max amount of traversed chunks waiting to be registered.
+		  Traversal pauses once this many are waiting. Default to 16.
+
+		- save_policy:
+		  When to save the blend file during generation.
+		  stage = once all assets are registered and once all
+		  previews are rendered, not per stream_chunk. Default.
+		  assets = every save_every_assets processed assets.
+		  seconds = every save_every_seconds.
+		  end = only once everything is done.
+		  The file is always saved when Blender needs it to be,
+		  e.g. after the run created new catalogues
+		  and before rendering previews.
+		  With a journal, stage and end also save every
+		  save_every_assets assets, since only saved work can be resumed.
+
+		- save_every_assets:
+		  Default to 500.
+
+		- save_every_seconds:
+		  Default to 300.
+
+		- journal:
+		  Absolute path of the per-asset progress journal.
+		  If a run dies half way, the next run skips the work
+		  the journal records as finished and saved.
+		  Work is only recorded once the blend file is saved,
+		  see save_policy.
+		  $auto = next to the blend file. Default.
+		  $none = don't keep a journal.
+
+		- incremental:
+		  1 = keep existing materials (and their previews), whose
+		  source maps, preview image and asset info didn't change
+		  since they were generated. Only changed assets are rebuilt.
+		  With shard_processes, only changed assets are sent to the
+		  shards. In the category output mode, every category file
+		  is checked by its own shard process.
+		  0 = rebuild everything. Default to 1.
+
+		- fingerprint_hash:
+		  1 = also compare a partial content hash of every source file,
+		  not just path, size and modification time. Default to 0.
+
+		- fingerprint_per_device:
+		  Max amount of assets, whose source files are stat'ed
+		  (and hashed) concurrently per device. Default to 8.
+
+		- shard_processes:
+		  Amount of headless Blender processes to build the assets in.
+		  Each builds its share of the assets into its own shard blend
+		  file, which are then merged into this blend file.
+		  0 or 1 = build everything in this Blender. Default to 0.
+
+		- shard_dir:
+		  Absolute path of the folder for the shard blend files.
+		  Default to "shards" in the addon's appdata folder.
+
+		- output_mode:
+		  single = everything ends up in this blend file. Default.
+		  category = write one blend file per top-level category
+		  (or per output group) into output_dir, next to the shared
+		  catalogue file. Only the files of the generated categories
+		  are touched. Built in shard_processes processes,
+		  0 = as many as there are CPU cores.
+
+		- output_groups:
+		  Comma-separated category:group pairs, putting several
+		  top-level categories into the same blend file,
+		  e.g. "Grunges:Surfaces,Stencils:Surfaces".
+		  Unlisted categories get their own file. Default to none.
+
+		- output_dir:
+		  Absolute path of the folder for the per-category blend files.
+		  $auto = the folder of cat_file. Default.
+
+		- mode:
+		  run = traverse and generate everything, then exit. Default.
+		  watch = keep running and only regenerate the assets affected
+		  by created, modified or deleted library files.
+		  On start, every asset goes through the generator once,
+		  to pick up changes made while not watching.
+		  Use it with incremental, which keeps unchanged assets.
+
+		- watch_poll_interval:
+		  Seconds between change checks in watch mode. Default to 5.
+
+		- watch_settle:
+		  Seconds without new changes to wait before regenerating,
+		  so that folders still being copied are processed once.
+		  Default to 2.
+	"""
+	def __init__(self, cfg=None):
+		self._worker_list = None
+		self._blender_cats = None
+		self._preview_wizard = None
+		self._device_scheduler = None
+		self._checkpoint = None
+		self._journal = None
+
+		self._allowed_workers = False
+		# Allowed workers, which eligible_workers skipped
+		self._skipped_workers = None
+
+		# Create a very simple config
+		self.cfg = {
+			'yield_group': '$all',
+			'allowed_workers': '$all',
+			'scan_cache': str(WZRD_APPDATA / 'scan_cache.sqlite'),
+			'scan_threads': '8',
+			'traverse_mode': 'threads',
+			'traverse_processes': '',
+			'traverse_per_device': '1',
+			'preview_per_device': '10',
+			'traversal_report': str(WZRD_APPDATA / 'traversal_report.json'),
+			'dedup': '0',
+			'dedup_per_device': '4',
+			'dedup_report': str(WZRD_APPDATA / 'dedup_report.json'),
+			'cat_sync': '0',
+			'cat_sync_scope': '$auto',
+			'cat_sync_report': str(WZRD_APPDATA / 'cat_sync_report.json'),
+			'material_templates': '1',
+			'deferred_images': '0',
+			'stream_chunk': '512',
+			'stream_queue': '16',
+			'mode': 'run',
+			'watch_poll_interval': '5',
+			'watch_settle': '2',
+			'save_policy': 'stage',
+			'save_every_assets': '500',
+			'save_every_seconds': '300',
+			'journal': '$auto',
+			'incremental': '1',
+			'fingerprint_hash': '0',
+			'fingerprint_per_device': '8',
+			'shard_processes': '0',
+			'shard_dir': str(WZRD_APPDATA / 'shards'),
+			'output_mode': 'single',
+			'output_groups': '',
+			'output_dir': '$auto',
+		}
+
+		# Shard processes get the config of the parent generator
+		if cfg is not None:
+			self.cfg.update(cfg)
+			return
+
+		for line in bpy.data.texts['asset_wzrd_cfg'].lines:
+			line = line.body
+			if not line or line.strip().startswith('#'):
+				continue
+
+			line_data = line.split('=')
+
+			self.cfg[line_data[0].strip()] = '='.join(line_data[1:]).strip()
+
+	@staticmethod
+	def import_module_from_path(python_file_path, module_name):
+		python_file_path = str(python_file_path)
 
-		# Otherwise - setup a material
+		spec = importlib.util.spec_from_file_location(
+			module_name,
+			python_file_path
+		)
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
 
-		# 
-		# Albedo + AO
-		# 
-		if self.input_data['albedo']:
-			albedo_img_node = self.create_image_node(
-				self.input_data['albedo']
-			)
-			albedo_img_node.image.alpha_mode = 'CHANNEL_PACKED'
-			albedo_img_node.location = self.NODE_LOCS['ao']
-			# AO
-			if self.input_data['ao']:
-				albedo_img_node.location = self.NODE_LOCS['albedo']
-				ao_img_node = self.create_image_node(
-					self.input_data['ao']
-				)
-				ao_img_node.location = self.NODE_LOCS['ao']
+		return module
 
-				col_mix_node = self.node_tree.nodes.new(
-					type='ShaderNodeMix'
-				)
-				col_mix_node.location = self.NODE_LOCS['albedo_ao_mix']
-				col_mix_node.data_type = 'RGBA'
-				col_mix_node.inputs['Factor'].default_value = 1.0
-				col_mix_node.blend_type = 'MULTIPLY'
+	@property
+	def allowed_workers(self):
+		if self._allowed_workers:
+			return self._allowed_workers
 
-				self.node_tree.links.new(
-					ao_img_node.outputs['Color'],
-					col_mix_node.inputs['B']
-				)
+		txt_data = bpy.data.texts.get('allowed_workers')
+		if not txt_data:
+			self._allowed_workers = ['$all',]
+			return self._allowed_workers
 
-				self.node_tree.links.new(
-					albedo_img_node.outputs['Color'],
-					col_mix_node.inputs['A']
-				)
+		self._allowed_workers = [
+			l.body.strip() for l in txt_data.lines if l.body and not l.body.strip().startswith('#')
+		]
 
+		return self._allowed_workers
 
-				self.node_tree.links.new(
-					col_mix_node.outputs['Result'],
-					self.bsdf_node.inputs['Base Color']
-				)
-			else:
-				self.node_tree.links.new(
-					albedo_img_node.outputs['Color'],
-					self.bsdf_node.inputs['Base Color']
-				)
+	@classmethod
+	def load_workers(cls, worker_index):
+		raw_list = cls.import_module_from_path(
+			worker_index,
+			'asset_wzrd_worker_index'
+		)
 
-		# 
-		# Normal + BW disp
-		# 
-		if self.input_data['normal']:
-			normal_map_img_node = self.create_image_node(
-				self.input_data['normal']
-			)
-			normal_map_img_node.location = self.NODE_LOCS['normal_map']
-			normal_map_img_node.image.colorspace_settings.name = 'Non-Color'
-			normal_map_data_node = self.node_tree.nodes.new(
-				type='ShaderNodeNormalMap'
-			)
-			normal_map_data_node.location = self.NODE_LOCS['normal_map_data_node']
-			self.node_tree.links.new(
-				normal_map_img_node.outputs['Color'],
-				normal_map_data_node.inputs['Color']
-			)
-			self.node_tree.links.new(
-				normal_map_data_node.outputs['Normal'],
-				self.bsdf_node.inputs['Normal']
-			)
+		worker_list = []
 
-		if self.input_data['bump']:
-			bump_img_node = self.create_image_node(
-				self.input_data['bump']
-			)
-			bump_img_node.image.colorspace_settings.name = 'Non-Color'
-			bump_img_node.location = self.NODE_LOCS['displacement']
-			disp_node = self.node_tree.nodes.new(
-				type='ShaderNodeDisplacement'
-			)
-			disp_node.location = self.NODE_LOCS['displacement_data_node']
-			self.node_tree.links.new(
-				bump_img_node.outputs['Color'],
-				disp_node.inputs['Height']
-			)
-			self.node_tree.links.new(
-				disp_node.outputs['Displacement'],
-				self.mat_output_node.inputs['Displacement']
-			)
+		for worker in raw_list.WORKER_INDEX:
+			worker.MapFinder = MapFinder
+			worker.DirectoryIndex = DirectoryIndex
+			worker_list.append(worker)
 
-		# 
-		# Rough/Gloss
-		# 
-		if self.input_data['rough'] or self.input_data['gloss']:
-			rg_img_node = self.create_image_node(
-				self.input_data['rough'] or self.input_data['gloss']
-			)
-			rg_img_node.location = self.NODE_LOCS['roughness']
-			rg_img_node.image.colorspace_settings.name = 'Non-Color'
+		return worker_list
 
-			if self.input_data['gloss'] and not self.input_data['rough']:
-				invert_node = self.node_tree.nodes.new(
-					type='ShaderNodeInvert'
-				)
-				invert_node.location = self.NODE_LOCS['gloss_invert']
-				self.node_tree.links.new(
-					rg_img_node.outputs['Color'],
-					invert_node.inputs['Color']
+	@property
+	def worker_list(self):
+		if self._worker_list != None:
+			return self._worker_list
+
+		self._worker_list = self.load_workers(self.cfg['worker_index'])
+
+		return self._worker_list
+
+	@property
+	def yield_group(self):
+		return frozenset(
+			grp.strip() for grp in self.cfg['yield_group'].split(',')
+			if grp.strip()
+		)
+
+	@property
+	def eligible_workers(self):
+		yield_group = self.yield_group
+
+		eligible = []
+		self._skipped_workers = []
+		for worker in self.worker_list:
+			allowed = any((
+				worker.__name__ in self.allowed_workers,
+				'$all' in self.allowed_workers,
+			))
+			if not allowed:
+				continue
+
+			manifest = WorkerManifest(worker)
+			if not manifest.can_yield(yield_group):
+				print(
+					'Skipping worker', worker.__name__,
+					'because none of its yield categories',
+					sorted(manifest.yield_categories),
+					'are present in config:', sorted(yield_group)
 				)
-				self.node_tree.links.new(
-					invert_node.outputs['Color'],
-					self.bsdf_node.inputs['Roughness']
+				self._skipped_workers.append(worker)
+				continue
+
+			if not manifest.roots_available:
+				print(
+					'Skipping worker', worker.__name__,
+					'because none of its roots exist:',
+					[str(root) for root in manifest.roots]
 				)
+				self._skipped_workers.append(worker)
+				continue
+
+			eligible.append(worker)
+
+		return eligible
+
+	@property
+	def device_scheduler(self):
+		if self._device_scheduler:
+			return self._device_scheduler
+
+		self._device_scheduler = DeviceScheduler()
+
+		return self._device_scheduler
+
+	@property
+	def journal(self):
+		if self._journal:
+			return self._journal
+
+		journal_path = self.cfg['journal']
+		if journal_path == '$auto':
+			journal_path = BLEND_FILE.with_suffix('.wzrd_journal')
+		elif journal_path == '$none':
+			journal_path = None
+
+		self._journal = GenerationJournal(journal_path)
+
+		return self._journal
+
+	@property
+	def checkpoint(self):
+		if self._checkpoint:
+			return self._checkpoint
+
+		self._checkpoint = SaveCheckpoint(
+			self.cfg['save_policy'],
+			int(self.cfg['save_every_assets']),
+			float(self.cfg['save_every_seconds']),
+			self.journal
+		)
+
+		return self._checkpoint
+
+	@property
+	def blender_cats(self):
+		if self._blender_cats:
+			return self._blender_cats
+
+		self._blender_cats = BlenderCatalogue(self.cfg['cat_file'])
+
+		return self._blender_cats
+
+	@property
+	def preview_wizard(self):
+		if self._preview_wizard:
+			return self._preview_wizard
+
+		self._preview_wizard = self.import_module_from_path(
+			THISDIR.parent / 'pwzrd/pwzrd.py',
+			'preview_wizard'
+		)
+
+		self._preview_wizard = self._preview_wizard.PreviewWizard
+
+		return self._preview_wizard
+
+	def setup_directory_index(self):
+		scan_cache = self.cfg['scan_cache']
+		if scan_cache and scan_cache != '$none':
+			DirectoryIndex.attach_scan_cache(scan_cache)
+
+		DirectoryIndex.set_scan_threads(self.cfg['scan_threads'])
+
+	@staticmethod
+	def iter_worker(worker, result_index, stats):
+		"""
+			Yield raw asset infos of a single worker, while recording
+			its wall time and directory index usage into stats.
+			Time spent by the consumer between items is not counted.
+			Neither is fingerprinting, which gets its own fingerprint_time.
+		"""
+		fingerprint = None
+		if result_index:
+			start_time = time.perf_counter()
+			prev_stats = DirectoryIndex.collect_stats(None)
+			try:
+				fingerprint = result_index.fingerprint(worker)
+			finally:
+				DirectoryIndex.collect_stats(prev_stats)
+			stats.fingerprint_time = time.perf_counter() - start_time
+
+		start_time = time.perf_counter()
+		prev_stats = DirectoryIndex.collect_stats(stats)
+		try:
+			if result_index:
+				worker_infos = result_index.get(worker, fingerprint)
+				if worker_infos is None:
+					worker_infos = list(worker())
+					result_index.put(worker, fingerprint, worker_infos)
+				else:
+					print('Reusing pregen index for', worker.__name__)
+					stats.from_index = True
 			else:
-				self.node_tree.links.new(
-					rg_img_node.outputs['Color'],
-					self.bsdf_node.inputs['Roughness']
+				worker_infos = worker()
+
+			worker_infos = iter(worker_infos)
+			while True:
+				try:
+					asset_info = next(worker_infos)
+				except StopIteration:
+					break
+
+				stats.wall_time += time.perf_counter() - start_time
+				DirectoryIndex.collect_stats(prev_stats)
+
+				yield asset_info
+
+				start_time = time.perf_counter()
+				prev_stats = DirectoryIndex.collect_stats(stats)
+		finally:
+			stats.wall_time += time.perf_counter() - start_time
+			DirectoryIndex.collect_stats(prev_stats)
+
+	@staticmethod
+	def iter_traversal(
+		yield_group,
+		worker_list,
+		result_index=None,
+		stats_list=None
+	):
+		"""
+			Run the workers and yield every asset info
+			allowed by the yield group.
+			- stats_list: List to append TraversalStats of every worker to.
+		"""
+		yield_group = frozenset(yield_group)
+		yield_all = '$all' in yield_group
+
+		for worker in worker_list:
+			stats = TraversalStats(worker.__name__)
+			if stats_list is not None:
+				stats_list.append(stats)
+
+			for asset_info in AssetWizard.iter_worker(worker, result_index, stats):
+				print(
+					'Traversing',
+					# asset_info['mat_name']
+					' '.join(asset_info['mat_name'].split(' ')[:-1]).ljust(150, ' '),
+					' '.join(asset_info['mat_name'].split(' ')[-1:]),
 				)
+				can_yield = yield_all or asset_info['yield_category'] in yield_group
+				if not can_yield:
+					print(
+						'Skipping', asset_info['mat_name'],
+						'because target yield_category', asset_info['yield_category'],
+						'is not present in config:', sorted(yield_group)
+					)
+					stats.add('assets_skipped')
+					continue
 
-		# 
-		# Metal
-		# 
-		if self.input_data['metal']:
-			metal_img_node = self.create_image_node(
-				self.input_data['metal']
-			)
-			metal_img_node.location = self.NODE_LOCS['metallic']
-			metal_img_node.image.colorspace_settings.name = 'Non-Color'
-			self.node_tree.links.new(
-				metal_img_node.outputs['Color'],
-				self.bsdf_node.inputs['Metallic']
-			)
+				stats.add('assets_yielded')
+				yield asset_info
 
-		# 
-		# Emission
-		# 
-		if self.input_data['emission']:
-			emit_img_node = self.create_image_node(
-				self.input_data['emission']
-			)
-			emit_img_node.location = self.NODE_LOCS['emission_col']
-			self.node_tree.links.new(
-				emit_img_node.outputs['Color'],
-				self.bsdf_node.inputs['Emission Color']
+	@staticmethod
+	def traversing_worker(
+		yield_group,
+		worker_list,
+		result_index=None
+	):
+		return list(AssetWizard.iter_traversal(
+			yield_group,
+			worker_list,
+			result_index
+		))
+
+	def traversing_process(
+		self,
+		yield_group,
+		worker_list,
+		result_index=None,
+		stats_list=None
+	):
+		"""
+			Same as iter_traversal(), but runs the workers in a separate
+			Python process, so that worker logic isn't serialized by the GIL.
+			The process is the plain interpreter Blender ships with
+			(sys.executable), executing this very file without bpy.
+
+			Yields chunks (lists) of asset infos as they arrive.
+			- stats_list: List to extend with the workers' stats dicts.
+		"""
+		worker_names = [worker.__name__ for worker in worker_list]
+
+		job = {
+			'worker_index': str(self.cfg['worker_index']),
+			'worker_names': worker_names,
+			'yield_group': yield_group,
+			'scan_cache': (
+				None if self.cfg['scan_cache'] == '$none'
+				else self.cfg['scan_cache']
+			),
+			'scan_threads': self.cfg['scan_threads'],
+			'index_entries': (
+				result_index.entries(worker_names) if result_index else None
+			),
+			'chunk_size': min(64, int(self.cfg['stream_chunk'])),
+		}
+
+		proc = subprocess.Popen(
+			[
+				sys.executable,
+				str(THISDIR / Path(__file__).name),
+				TRAVERSAL_PROCESS_ARG,
+			],
+			stdin=subprocess.PIPE,
+			stdout=subprocess.PIPE
+		)
+
+		proc.stdin.write(pickle.dumps(job, protocol=pickle.HIGHEST_PROTOCOL))
+		proc.stdin.close()
+
+		finished = False
+		try:
+			while frame := read_frame(proc.stdout):
+				frame_type, frame_data = frame
+				if frame_type == 'asset_infos':
+					yield frame_data
+				elif frame_type == 'index':
+					result_index.merge(frame_data)
+				elif frame_type == 'stats':
+					if stats_list is not None:
+						stats_list.extend(frame_data)
+				elif frame_type == 'error':
+					raise RuntimeError(
+						f'Traversal process for {worker_names} failed:\n{frame_data}'
+					)
+				elif frame_type == 'done':
+					finished = True
+		finally:
+			if not finished:
+				proc.kill()
+			proc.stdout.close()
+			proc.wait()
+
+		if not finished:
+			raise RuntimeError(
+				f'Traversal process for {worker_names} exited unexpectedly '
+				f'with code {proc.returncode}'
 			)
-			if self.input_data['emission_fac']:
-				emit_fac_img_node = self.create_image_node(
-					self.input_data['emission_fac']
-				)
-				emit_fac_img_node.location = self.NODE_LOCS['emission_fac']
-			else:
-				emit_fac_img_node = emit_img_node
 
-			self.node_tree.links.new(
-				emit_fac_img_node.outputs['Color'],
-				self.bsdf_node.inputs['Emission Strength']
+	def iter_asset_infos(self):
+		"""
+			Traverse all eligible workers and yield asset infos
+			as soon as they arrive.
+
+			Every device lane (see DeviceScheduler) is traversed
+			by its own producer
+			(a thread or a traversal process), which pushes chunks
+			of asset infos into a bounded queue. Producers block while
+			the queue is full, so a slow consumer (Blender) keeps
+			memory usage in check.
+		"""
+		result_index = None
+		if self.cfg.get('pregen_index'):
+			result_index = WorkerResultIndex(self.cfg['pregen_index'])
+
+		self.setup_directory_index()
+
+		worker_lanes = self.device_scheduler.lanes(
+			self.eligible_workers,
+			lambda worker: WorkerManifest(worker).roots[0],
+			int(self.cfg['traverse_per_device']),
+			is_dir=True
+		)
+
+		yield_grp = self.yield_group
+		chunk_size = int(self.cfg['stream_chunk'])
+
+		start_time = time.perf_counter()
+		# Either TraversalStats (threads) or dicts (processes)
+		stats_list = []
+
+		info_queue = queue.Queue(maxsize=int(self.cfg['stream_queue']))
+		producer_done = object()
+		# Set when the consumer is gone, e.g. Blender raised mid-stream
+		stop_producers = threading.Event()
+
+		use_processes = self.cfg['traverse_mode'] == 'processes'
+		proc_slots = threading.BoundedSemaphore(
+			int(self.cfg['traverse_processes'] or 0) or os.cpu_count()
+		)
+
+		def push(item):
+			"""
+				Put an item into the queue, unless the consumer is gone.
+				Returns False if the producer should stop.
+			"""
+			while not stop_producers.is_set():
+				try:
+					info_queue.put(item, timeout=0.1)
+					return True
+				except queue.Full:
+					continue
+
+			return False
+
+		def produce(worker_group):
+			try:
+				if use_processes:
+					with proc_slots:
+						if stop_producers.is_set():
+							return
+						# Closing the generator kills the traversal process
+						with contextlib.closing(self.traversing_process(
+							yield_grp, worker_group, result_index, stats_list
+						)) as chunks:
+							for chunk in chunks:
+								if not push(chunk):
+									return
+				else:
+					with contextlib.closing(self.iter_traversal(
+						yield_grp, worker_group, result_index, stats_list
+					)) as asset_infos:
+						for chunk in chunked(asset_infos, chunk_size):
+							if not push(chunk):
+								return
+			except Exception as e:
+				push(e)
+			finally:
+				push(producer_done)
+
+		producers = [
+			threading.Thread(
+				target=produce,
+				args=(worker_group,),
+				daemon=True
 			)
+			for worker_group in worker_lanes
+		]
+		for producer in producers:
+			producer.start()
+
+		try:
+			producers_left = len(producers)
+			while producers_left:
+				chunk = info_queue.get()
+				if chunk is producer_done:
+					producers_left -= 1
+					continue
 
-		# 
-		# Alpha
-		# 
-		if self.input_data['alpha']:
-			alpha_source = str(self.input_data['alpha'])
+				if isinstance(chunk, Exception):
+					raise chunk
 
-			# From albedo = same file as albedo
-			if '$from_albedo' in alpha_source:
-				alpha_img_filepath = self.input_data['albedo']
-			else:
-				alpha_img_filepath = self.input_data['alpha']
+				yield from chunk
+		finally:
+			# Unblock the producers still running and wait for them,
+			# so that no traversal process is left behind
+			stop_producers.set()
+			for producer in producers:
+				while producer.is_alive():
+					with contextlib.suppress(queue.Empty):
+						while True:
+							info_queue.get_nowait()
+					producer.join(0.1)
+
+			DirectoryIndex.flush_scan_cache()
 
-			# New image for alpha channel is always created
-			alpha_img_node = self.create_image_node(
-				alpha_img_filepath,
-				allow_duplicate=True
+			if result_index:
+				result_index.save()
+
+			self.write_traversal_report(
+				[
+					stats.as_dict() if isinstance(stats, TraversalStats) else stats
+					for stats in stats_list
+				],
+				time.perf_counter() - start_time
 			)
-			alpha_img_node.location = self.NODE_LOCS['alpha']
-			alpha_img_node.image.colorspace_settings.name = 'Non-Color'
 
-			# Decide how to connect the node to the alpha input
-			alpha_link = None
-			if alpha_source == '$from_albedo_rgb':
-				alpha_link = self.node_tree.links.new(
-					alpha_img_node.outputs['Color'],
-					self.bsdf_node.inputs['Alpha']
-				)
-			elif alpha_source == '$from_albedo':
-				# From albedo alpha channel
-				alpha_link = self.node_tree.links.new(
-					alpha_img_node.outputs['Alpha'],
-					self.bsdf_node.inputs['Alpha']
-				)
-			else:
-				# Dedicated alpha mask
-				alpha_link = self.node_tree.links.new(
-					alpha_img_node.outputs['Color'],
-					self.bsdf_node.inputs['Alpha']
-				)
+	def write_traversal_report(self, worker_stats, total_time):
+		"""
+			Write per-worker traversal stats as JSON,
+			slowest worker first.
+		"""
+		worker_stats = sorted(
+			worker_stats,
+			key=lambda stats: stats['wall_time'],
+			reverse=True
+		)
 
-			if 'alpha' in self.input_data['disconnected'] and alpha_link:
-				self.node_tree.links.remove(alpha_link)
+		for stats in worker_stats[:5]:
+			print(
+				'Traversal time:', stats['worker'].ljust(50, ' '),
+				f"{stats['wall_time']:.2f}s"
+			)
 
+		report_path = self.cfg['traversal_report']
+		if not report_path or report_path == '$none':
+			return
 
-		return self._material
+		report_path = Path(report_path)
+		report_path.parent.mkdir(parents=True, exist_ok=True)
+		report_path.write_text(
+			json.dumps(
+				{
+					'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+					'total_time': round(total_time, 4),
+					'traverse_mode': self.cfg['traverse_mode'],
+					'workers': worker_stats,
+				},
+				indent='\t'
+			),
+			encoding='utf-8'
+		)
 
+		print('Traversal report written to', report_path)
 
-class ImageBasedAssetPreview:
-	def __init__(self, parent_asset):
-		self.asset = parent_asset
-		self.raw_path = self.asset.input_data['preview']
-		self.cooked_path = None
-		self.crop_params = self.asset.input_data['pre_crop_data']
-		self.done = False
+	def create_asset_info_lists_mp(self):
+		return list(self.iter_asset_infos())
 
-	@property
-	def eligible(self):
-		if not self.raw_path:
-			return False
-		
-		if not Path(self.raw_path).is_file():
-			return False
+	def assign_previews(self, asset_list):
+		eligible = [
+			asset for asset in asset_list
+			if asset.preview.eligible
+			and not asset.preview.done
+			and not asset.preview.cooked_path
+		]
 
-		return True
+		def cook(asset):
+			print('Cooking preview for', asset.input_data['mat_name'])
+			if asset.preview.cook():
+				# Cooked images don't depend on the blend file
+				self.journal.record(
+					asset.input_data,
+					'preview_cooked',
+					str(asset.preview.cooked_path),
+					immediate=True
+				)
 
-	def generate_cooked_path(self):
-		return BLEND_FILE.parent / f'pwzrd_cooked_{str(uuid.uuid4())}.png'
+		# Cook existing previews in threads,
+		# grouped by the device the raw previews live on
+		self.device_scheduler.run(
+			eligible,
+			lambda asset: asset.preview.raw_path,
+			cook,
+			int(self.cfg['preview_per_device'])
+		)
 
-	def cook(self, tgt_img=None, crop_params=None):
-		if not self.raw_path and not tgt_img:
-			return False
+		for asset in asset_list:
+			if asset.preview.cooked_path:
+				print('Applying preview for', asset.input_data['mat_name'])
+				asset.preview.apply()
+				self.journal.record(asset.input_data, 'preview_applied')
+				self.checkpoint.progress()
 
-		if tgt_img:
-			self.raw_path = tgt_img
+		return asset_list
 
-		if crop_params:
-			self.crop_params = crop_params
+	def render_previews(self, asset_list):
+		if not asset_list:
+			return
 
-		intermediate = []
+		# Previews are rendered from the blend file on disk,
+		# which must contain every material
+		if self.checkpoint.pending:
+			self.checkpoint.save('before rendering previews')
 
-		tgt_img = Path(self.raw_path)
-		img_write_path = self.generate_cooked_path()
+		# Generate previews for assets that don't have one
+		with self.preview_wizard(BLENDER_EXECUTABLE) as pwzrd:
+			for asset in asset_list:
+				if asset.preview.done:
+					continue
 
-		if self.crop_params:
-			p = self.crop_params
-			crop_str = ''.join([
-				# Crop
-				'in_w*', str(p['crop_w']),
-				':',
-				'in_h*', str(p['crop_h']),
-				':',
-				# Center
-				'in_w*', str(p['center_w']),
-				':',
-				'in_h*', str(p['center_h']),
-			])
-			subprocess.call(
-				[
-					str(FFMPEG),
-					'-y',
-					'-loglevel', 'quiet',
-					'-i', str(tgt_img),
-					'-vf', f'crop={crop_str}',
-					str(img_write_path)
-				],
-				shell=True,
-				stdout=subprocess.DEVNULL
-			)
+				print('Rendering preview for', asset.input_data['mat_name'])
+				render_result = pwzrd.render(
+					asset.input_data['custom_preview_prms'] | {
+						'material_source': str(BLEND_FILE),
+						'src_material_name': asset.datablock.name,
+					}
+				).decode()
+				if render_result.startswith('$fail'):
+					print(
+						'Failed to render Blender preview for',
+						asset.input_data['mat_name'],
+						'Reason:', render_result.split('$fail:')[-1]
+					)
+					continue
+				print(
+					'Rendered custom preview:', render_result,
+					'for', asset.input_data['mat_name']
+				)
+				# asset.set_preview(render_result)
+				asset.preview.cook(render_result)
+				asset.preview.apply(True)
+				self.journal.record(asset.input_data, 'preview_rendered')
+				self.checkpoint.progress()
 
-			if not img_write_path.is_file():
-				return False
+		self.checkpoint.stage_end('rendered previews')
 
-			intermediate.append(img_write_path)
+	def fingerprint_assets(self, asset_list):
+		"""
+			Compute the SourceFingerprint of every asset,
+			grouped by the device the sources live on.
+		"""
+		fingerprint = SourceFingerprint(
+			ContentHasher() if self.cfg['fingerprint_hash'] == '1' else None
+		)
 
-			tgt_img = img_write_path
-			img_write_path = self.generate_cooked_path()
+		def compute(asset):
+			asset.img_asset.fingerprint = fingerprint.compute(asset.input_data)
 
-		subprocess.call(
-			[
-				str(FFMPEG),
-				'-y',
-				'-loglevel', 'quiet',
-				'-i', str(tgt_img),
-				'-vf', f'scale={PREVIEW_RESOLUTION}:-1',
-				'-qscale:v', str(PREVIEW_QUALITY),
-				str(img_write_path)
-			],
-			shell=True,
-			stdout=subprocess.DEVNULL
+		self.device_scheduler.run(
+			asset_list,
+			lambda asset: asset.input_data['import_source'],
+			compute,
+			int(self.cfg['fingerprint_per_device'])
 		)
 
-		while intermediate:
-			intermediate.pop().unlink(missing_ok=True)
+	def keep_unchanged(self, asset):
+		"""
+			Keep the existing material of an asset, along with its preview,
+			if it was generated from the exact same sources and parameters
+			and still belongs to the right catalogue.
+			Returns True if the asset doesn't need to be rebuilt.
+		"""
+		if not asset.img_asset.fingerprint:
+			return False
 
-		if not img_write_path.is_file():
+		mat = bpy.data.materials.get(
+			self.asset_info_mat_name(asset.input_data)
+		)
+		if not mat or not mat.asset_data:
 			return False
 
-		self.cooked_path = img_write_path
+		wzrd_asset_data = mat.get('_wzrd_asset_data')
+		if not wzrd_asset_data:
+			return False
+
+		if wzrd_asset_data.get('fingerprint') != asset.img_asset.fingerprint:
+			return False
+
+		if mat.asset_data.catalog_id != self.blender_cats.uid(asset.cat_path):
+			return False
+
+		asset.adopt(mat)
+
+		if wzrd_asset_data.get('has_preview'):
+			asset.preview.done = True
+			asset.preview.cooked_path = None
+
 		return True
 
-	def apply(self, del_source=False):
-		if not self.cooked_path:
+	def resume_asset(self, asset):
+		"""
+			Restore the state of an asset, which was created and
+			registered by a previous run, according to the journal.
+			Returns True if the asset doesn't need to be created again.
+		"""
+		stages = self.journal.stages(asset.input_data)
+
+		# Cooked previews can be reused even if the material is gone
+		cooked_path = stages.get('preview_cooked')
+		if cooked_path and Path(cooked_path).is_file():
+			asset.preview.cooked_path = Path(cooked_path)
+
+		if not 'registered' in stages:
 			return False
 
-		context = bpy.context
-		override = context.copy()
-		override['id'] = self.asset.asset_data
-		with context.temp_override(**override):
-			bpy.ops.ed.lib_id_load_custom_preview(
-				filepath=str(self.cooked_path)
-			)
+		mat = bpy.data.materials.get(
+			self.asset_info_mat_name(asset.input_data)
+		)
+		if not mat or not mat.asset_data:
+			return False
 
-		self.done = True
-		self.cooked_path.unlink(missing_ok=True)
-		self.cooked_path = None
+		asset.adopt(mat)
 
-		if del_source and self.raw_path:
-			Path(self.raw_path).unlink(missing_ok=True)
-			self.raw_path = None
+		if 'preview_applied' in stages or 'preview_rendered' in stages:
+			asset.preview.done = True
+			asset.preview.cooked_path = None
 
 		return True
 
+	def register_assets(self, asset_infos):
+		"""
+			Create materials, catalogues and existing previews
+			for a list of asset infos.
+			Returns the list of resulting catalogue items.
+		"""
+		asset_list = []
 
+		# 1 - Create a list of catalogue items
+		for asset_info in asset_infos:
+			asset_list.append(ImageBasedAssetCatalogueItem(
+				self.blender_cats,
+				asset_info
+			))
 
-class ImageBasedAssetCatalogueItem:
-	def __init__(self, parent_cat, input_data):
-		self.parent_cat = parent_cat
-		self.input_data = AssetBaseData.defaults_all | input_data
-		self.img_asset = ImageBasedAsset(self.input_data)
+		if self.cfg['incremental'] == '1':
+			self.fingerprint_assets(asset_list)
 
-		self._asset_data = None
+		# 2 - register catalogues, with a single write of the cats file
+		self.blender_cats.create_cats(
+			asset.cat_path for asset in asset_list
+		)
 
-		self._cat_uid = None
+		# Blender must see every catalogue before assets are assigned
+		self.blender_cats.flush()
 
-		self.preview = ImageBasedAssetPreview(self)
+		# Assets finished by a previous run, which died half way,
+		# or generated from the exact same sources before
+		kept = {
+			asset for asset in asset_list
+			if self.resume_asset(asset) or self.keep_unchanged(asset)
+		}
 
-	# Calling this will only return the underlying material
-	# datablock regardless of whether it's registered in the asset catalogue
-	# or not
-	@property
-	def datablock(self):
-		return self.img_asset.datablock
-	
-	def validate(self):
-		for map_name in AssetBaseData.defaults_maps.keys():
-			if self.input_data.get(map_name):
-				return True
+		# 3 - Assign assets to catalogues
+		for asset in asset_list:
+			if asset in kept:
+				continue
 
-		return False
+			# Create the material
+			asset.datablock
+			self.journal.record(asset.input_data, 'created')
 
-	# Getting this triggers everything to be registered
-	# Returns underlying material datablock, but in registered state
-	@property
-	def asset_data(self):
-		if self._asset_data:
-			return self._asset_data
+			print('Assigning to catalogue', asset.input_data['mat_name'])
+			asset.reg()
+			self.journal.record(asset.input_data, 'registered')
+			self.checkpoint.progress()
 
-		self.reg()
+		# confirm('Done registering. Press Enter To Continue')
 
-		return self._asset_data
+		# Assign existing previews
+		self.assign_previews(asset_list)
 
-	# Simply create a catalogue in the txt file
-	def create_cat(self):
-		return self.parent_cat.create_cat(
-			self.input_data['category'].strip(' /') + '/' +
-			'/'.join(self.input_data['mat_name'].split('/')[:-1])
+		# confirm('Done with existing previews. Press Enter To Continue')
+
+		return asset_list
+
+	def process_assets(self, asset_infos):
+		"""
+			Create materials, catalogues and previews
+			for the given asset infos.
+			asset_infos can be any iterable, including a stream,
+			in which case assets get registered in chunks as they arrive.
+			Previews that have to be rendered are rendered at the very end.
+			Returns the set of catalogue paths of the processed assets.
+		"""
+		pending_renders = []
+		cat_paths = set()
+		cat_count = len(self.blender_cats.cat_list)
+
+		ImageBasedAsset.use_templates = self.cfg['material_templates'] == '1'
+		ImageBasedAsset.image_index.deferred = self.cfg['deferred_images'] == '1'
+
+		for info_chunk in chunked(asset_infos, int(self.cfg['stream_chunk'])):
+			for asset in self.register_assets(info_chunk):
+				cat_paths.add(asset.cat_path)
+				if not asset.preview.done:
+					pending_renders.append(asset)
+
+		ImageBasedAsset.clear_templates()
+
+		# Stages span the whole run, not single chunks.
+		# Saving also makes Blender refresh the catalogues,
+		# which is always needed when there are new ones
+		self.checkpoint.stage_end(
+			'registration',
+			force=len(self.blender_cats.cat_list) != cat_count
 		)
 
-	# Basically same as create_cat()
-	@property
-	def cat_uid(self):
-		if self._cat_uid:
-			return self._cat_uid
+		self.render_previews(pending_renders)
+
+		if self.checkpoint.pending:
+			self.checkpoint.save('end')
+		self.checkpoint.summary()
 
-		self._cat_uid = self.create_cat()
+		# Everything is saved, nothing left to resume
+		self.journal.finish()
 
-		return self._cat_uid
+		return cat_paths
 
-	# Register the asset in the catalogue
-	def reg(self):
-		self.datablock.asset_mark()
-		self.datablock.asset_data.catalog_id = self.cat_uid
-		for tag in self.input_data['tags']:
-			self.datablock.asset_data.tags.new(
-				tag,
-				skip_if_exists=True
+	def sync_catalogues(self, cat_paths):
+		"""
+			Remove stale catalogues, according to the cat_sync config.
+			- cat_paths: Every catalogue path implied by the current run.
+		"""
+		sync_mode = self.cfg['cat_sync']
+		if not sync_mode in ('1', 'dry'):
+			return
+
+		# Catalogues of workers which didn't run would look stale
+		if not '$all' in self.allowed_workers:
+			print('Catalogue sync: skipped, since not all workers were allowed')
+			return
+
+		if self.yield_group != {'$all'}:
+			print('Catalogue sync: skipped, since yield_group is not $all')
+			return
+
+		if self._skipped_workers is None:
+			self.eligible_workers
+		if self._skipped_workers:
+			print(
+				'Catalogue sync: skipped, since these workers did not run:',
+				[worker.__name__ for worker in self._skipped_workers]
 			)
+			return
 
-		self.datablock.asset_data.tags.new(
-			f"""${self.input_data['asset_type']}""",
-			skip_if_exists=True
+		if self.cfg['cat_sync_scope'] == '$auto':
+			scope = {
+				cat_path.split('/')[0] for cat_path in cat_paths
+			}
+		elif self.cfg['cat_sync_scope'] == '$all':
+			scope = None
+		else:
+			scope = [
+				BlenderCatalogue.norm_path(cat_path)
+				for cat_path in self.cfg['cat_sync_scope'].split(',')
+				if cat_path.strip()
+			]
+
+		cat_diff = self.blender_cats.sync(
+			cat_paths,
+			scope,
+			dry_run=(sync_mode == 'dry')
 		)
 
-		self._asset_data = self.datablock
+		print(
+			'Catalogue sync' + (' (dry run)' if sync_mode == 'dry' else '') + ':',
+			len(cat_diff['add']), 'to add,',
+			len(cat_diff['remove']), 'to remove'
+		)
+		for cat_path in cat_diff['add']:
+			print('\t+', cat_path)
+		for cat_path in cat_diff['remove']:
+			print('\t-', cat_path)
+
+		report_path = self.cfg['cat_sync_report']
+		if report_path and report_path != '$none':
+			report_path = Path(report_path)
+			report_path.parent.mkdir(parents=True, exist_ok=True)
+			report_path.write_text(
+				json.dumps(
+					cat_diff | {
+						'dry_run': sync_mode == 'dry',
+						'scope': sorted(scope) if scope is not None else '$all',
+					},
+					indent='\t'
+				),
+				encoding='utf-8'
+			)
 
+		if cat_diff['remove'] and sync_mode != 'dry':
+			# Let Blender pick up the removals
+			self.checkpoint.save('catalogue sync')
 
-def confirm(msg='Proceed?'):
-	assert (input(msg).lower() != 'n')
+	def iter_unique_asset_infos(self):
+		"""
+			Same as iter_asset_infos(), but with duplicate materials
+			dropped, if enabled in the config.
+		"""
+		if self.cfg['dedup'] != '1':
+			yield from self.iter_asset_infos()
+			return
 
+		dedup = DuplicateFilter(
+			self.device_scheduler,
+			int(self.cfg['dedup_per_device'])
+		)
+		yield from dedup.filter(
+			self.iter_asset_infos(),
+			int(self.cfg['stream_chunk'])
+		)
 
-class AssetWizard:
-	"""
-		Config syntax is as follows:
-		    key = value
-		    key = value
-		    ...
-		Values can have "=" symbols in them, but not keys.
-		Key Value pairs are separated by line breaks.
+		# Earlier runs may have kept a different copy
+		for asset_info in dedup.duplicates:
+			mat = bpy.data.materials.get(self.asset_info_mat_name(asset_info))
+			if not mat:
+				continue
 
-		"asset_wzrd_cfg" text datablock accepts following keys:
-		- yield_group:
-		  Comma-separated yield groups.
-		  $all = accept all groups.
+			wzrd_asset_data = mat.get('_wzrd_asset_data')
+			if wzrd_asset_data and wzrd_asset_data.get('source') == str(asset_info['import_source']):
+				print('Removing duplicate material', mat.name)
+				bpy.data.materials.remove(mat)
 
-		- worker_index:
-		  Absolute path pointing to a python file, containing workers to be
-		  executed. Must not have quotation marks
+		if self.cfg['dedup_report'] and self.cfg['dedup_report'] != '$none':
+			dedup.write_report(self.cfg['dedup_report'])
 
-		- cat_file:
-		  Absolute path pointing to the cats.txt file.
+	def build_shards(self, shards, max_processes):
+		"""
+			Build each shard in its own headless Blender process,
+			running up to max_processes at once.
+			Existing shard files are opened and updated in place.
+			Catalogues are created with a single write before
+			the shards start, so that shards never write the cats file.
+			- shards: [(shard_file, [asset_info, ...]), ...]
+			Returns [(shard_file, shard_result), ...]
+		"""
+		self.blender_cats.create_cats(
+			ImageBasedAssetCatalogueItem(self.blender_cats, asset_info).cat_path
+			for shard_file, shard_infos in shards
+			for asset_info in shard_infos
+		)
 
-		- pregen_index:
-		  Pregenerated index path.
-	"""
-	def __init__(self):
-		self._worker_list = None
-		self._blender_cats = None
-		self._preview_wizard = None
+		running = []
+		launched = []
+		for shard_file, shard_infos in shards:
+			shard_file.parent.mkdir(parents=True, exist_ok=True)
+			job_file = shard_file.with_suffix('.job')
+			result_file = shard_file.with_suffix('.result')
+			result_file.unlink(missing_ok=True)
+
+			with open(job_file, 'wb') as job_buf:
+				pickle.dump(
+					{
+						'cfg': self.cfg,
+						'shard_file': str(shard_file),
+						'result_file': str(result_file),
+						'asset_infos': shard_infos,
+					},
+					job_buf,
+					protocol=pickle.HIGHEST_PROTOCOL
+				)
 
-		self._allowed_workers = False
+			while len(running) >= max_processes:
+				running.pop(0).wait()
 
-		# Create a very simple config
-		self.cfg = {
-			'yield_group': '$all',
-			'allowed_workers': '$all',
-		}
-		for line in bpy.data.texts['asset_wzrd_cfg'].lines:
-			line = line.body
-			if not line or line.strip().startswith('#'):
-				continue
+			print(
+				'Starting shard', shard_file.name,
+				'with', len(shard_infos), 'assets'
+			)
+			proc = subprocess.Popen([
+				str(BLENDER_EXECUTABLE),
+				'-b',
+				*([str(shard_file)] if shard_file.is_file() else []),
+				'--factory-startup',
+				'--python-exit-code', '1',
+				'--python', str(THISDIR / Path(__file__).name),
+				'--',
+				SHARD_PROCESS_ARG, str(job_file),
+			])
+			running.append(proc)
+			launched.append((shard_file, job_file, result_file, proc,))
+
+		# Wait for every shard before reporting failures,
+		# so that no process is left running
+		for proc in running:
+			proc.wait()
+
+		shard_results = []
+		for shard_file, job_file, result_file, proc in launched:
+			job_file.unlink(missing_ok=True)
+			if not result_file.is_file():
+				raise RuntimeError(
+					f'Shard process for {shard_file} exited unexpectedly '
+					f'with code {proc.returncode}'
+				)
 
-			line_data = line.split('=')
+			with open(result_file, 'rb') as result_buf:
+				shard_result = pickle.load(result_buf)
+			result_file.unlink()
 
-			self.cfg[line_data[0].strip()] = '='.join(line_data[1:]).strip()
+			if shard_result['error']:
+				raise RuntimeError(
+					f'Shard process for {shard_file} failed:\n{shard_result["error"]}'
+				)
 
-	@staticmethod
-	def import_module_from_path(python_file_path, module_name):
-		python_file_path = str(python_file_path)
+			shard_results.append((shard_file, shard_result,))
 
-		spec = importlib.util.spec_from_file_location(
-			module_name,
-			python_file_path
-		)
-		module = importlib.util.module_from_spec(spec)
-		spec.loader.exec_module(module)
+		return shard_results
 
-		return module
+	def generate_shards(self, asset_infos):
+		"""
+			Build the given asset infos in shard_processes temporary
+			shard blend files, to be merged with merge_shards().
+			Returns [(shard_file, shard_result), ...]
+		"""
+		asset_infos = list(asset_infos)
+		if not asset_infos:
+			return []
 
-	@property
-	def allowed_workers(self):
-		if self._allowed_workers:
-			return self._allowed_workers
+		shard_dir = Path(self.cfg['shard_dir'])
 
-		txt_data = bpy.data.texts.get('allowed_workers')
-		if not txt_data:
-			self._allowed_workers = ['$all',]
-			return self._allowed_workers
+		# Contiguous slices, so that assets from the same folders
+		# end up in the same shard
+		shard_count = int(self.cfg['shard_processes'])
+		shard_size = -(-len(asset_infos) // shard_count)
 
-		self._allowed_workers = [
-			l.body.strip() for l in txt_data.lines if l.body and not l.body.strip().startswith('#')
-		]
+		shards = []
+		for shard_idx, shard_infos in enumerate(chunked(asset_infos, shard_size)):
+			shard_file = shard_dir / f'wzrd_shard_{shard_idx}.blend'
+			# Temporary shards always start from scratch
+			shard_file.unlink(missing_ok=True)
+			shards.append((shard_file, shard_infos,))
 
-		return self._allowed_workers
+		return self.build_shards(shards, shard_count)
 
 	@property
-	def worker_list(self):
-		if self._worker_list != None:
-			return self._worker_list
-	
-		raw_list = self.import_module_from_path(
-			self.cfg['worker_index'],
-			'asset_wzrd_worker_index'
-		)
-
-		self._worker_list = []
-
-		for worker in raw_list.WORKER_INDEX:
-			worker.MapFinder = MapFinder
-			self._worker_list.append(worker)
+	def output_groups(self):
+		"""
+			{top-level category: output group name}
+			from the output_groups config.
+		"""
+		output_groups = {}
+		for group_def in self.cfg['output_groups'].split(','):
+			if not ':' in group_def:
+				continue
+			category, group_name = group_def.split(':', 1)
+			output_groups[category.strip(' /')] = group_name.strip()
 
-		return self._worker_list
+		return output_groups
 
 	@property
-	def blender_cats(self):
-		if self._blender_cats:
-			return self._blender_cats
+	def output_dir(self):
+		"""
+			Folder of the per-category blend files.
+			$auto = the folder of the shared catalogue file,
+			which is the root of the asset library.
+		"""
+		if self.cfg['output_dir'] == '$auto':
+			return Path(self.cfg['cat_file']).parent
 
-		self._blender_cats = BlenderCatalogue(self.cfg['cat_file'])
+		return Path(self.cfg['output_dir'])
 
-		return self._blender_cats
+	def generate_category_shards(self, asset_infos):
+		"""
+			Build the given asset infos into one blend file per
+			top-level category, or per output group, in output_dir.
+			Only the files of categories present in asset_infos
+			are touched. Existing files are updated in place.
+			Returns [(shard_file, shard_result), ...]
+		"""
+		output_groups = self.output_groups
 
-	@property
-	def preview_wizard(self):
-		if self._preview_wizard:
-			return self._preview_wizard
+		grouped = {}
+		for asset_info in asset_infos:
+			category = ImageBasedAssetCatalogueItem(
+				self.blender_cats,
+				asset_info
+			).cat_path.split('/')[0]
+			group_name = output_groups.get(category, category)
+			grouped.setdefault(group_name, []).append(asset_info)
 
-		self._preview_wizard = self.import_module_from_path(
-			THISDIR.parent / 'pwzrd/pwzrd.py',
-			'preview_wizard'
+		shards = [
+			(self.output_dir / f'{char_fixup(group_name)}.blend', group_infos,)
+			for group_name, group_infos in sorted(grouped.items())
+		]
+
+		return self.build_shards(
+			shards,
+			max(1, int(self.cfg['shard_processes'] or 0) or os.cpu_count())
 		)
 
-		self._preview_wizard = self._preview_wizard.PreviewWizard
+	@staticmethod
+	def merge_duplicate_images():
+		"""
+			Shards load the same files independently.
+			Remap images with the same file and settings onto one datablock.
+			The image index is kept up to date, appended images included.
+		"""
+		image_index = ImageBasedAsset.image_index
 
-		return self._preview_wizard
+		kept_images = {}
+		for img in list(bpy.data.images):
+			if not img.filepath:
+				continue
 
-	@staticmethod
-	def traversing_worker(yield_group, worker_list, mp_pipe=None):
-		asset_infos = []
-		for worker in worker_list:
-			for asset_info in worker():
-				print(
-					'Traversing',
-					# asset_info['mat_name']
-					' '.join(asset_info['mat_name'].split(' ')[:-1]).ljust(150, ' '),
-					' '.join(asset_info['mat_name'].split(' ')[-1:]),
-				)
-				can_yield = any((
-					'$all' in yield_group,
-					asset_info['yield_category'] in yield_group,
-				))
-				if not can_yield:
-					print(
-						'Skipping', asset_info['mat_name'],
-						'because target yield_category', asset_info['yield_category'],
-						'is not present in config:', yield_group
-					)
-					continue
+			img_key = (
+				ImageIndex.norm_path(img.filepath),
+				img.colorspace_settings.name,
+				img.alpha_mode,
+			)
+			kept_img = kept_images.setdefault(img_key, img)
+			if kept_img != img:
+				img.user_remap(kept_img)
+				image_index.remove(img)
 
-				asset_infos.append(asset_info)
+		for kept_img in kept_images.values():
+			image_index.add(kept_img)
 
-		if mp_pipe:
-			mp_pipe.send(asset_infos)
-		else:
-			return asset_infos
+	def merge_shards(self, shard_results):
+		"""
+			Append the assets of every shard into this blend file,
+			replacing materials with the same names.
+			Shard files are deleted afterwards.
+		"""
+		if not shard_results:
+			return
 
-	def create_asset_info_lists_mp(self):
-		pregen_index = self.cfg.get('pregen_index')
-		if pregen_index:
-			if Path(pregen_index).is_file():
-				with open(pregen_index, 'rb') as tgt_file:
-					return pickle.load(tgt_file)
-			else:
-				pregen_index = Path(pregen_index)
+		for shard_file, shard_result in shard_results:
+			mat_names = shard_result['mat_names']
+			for mat_name in mat_names:
+				if mat_name in bpy.data.materials:
+					bpy.data.materials.remove(bpy.data.materials[mat_name])
 
-		disks_dict = {}
-		for worker in self.worker_list:
-			eligible = any((
-				worker.__name__ in self.allowed_workers,
-				'$all' in self.allowed_workers,
-			))
-			if not eligible:
-				continue
+			with bpy.data.libraries.load(str(shard_file), link=False) as (data_from, data_to):
+				data_to.materials = list(mat_names)
 
-			disk_letter = Path(worker.LIB_BASE_PATH).anchor
-			if not disk_letter in disks_dict:
-				disks_dict[disk_letter] = []
+			print('Merged', len(mat_names), 'assets from', shard_file.name)
 
-			disks_dict[disk_letter].append(worker)
+		self.merge_duplicate_images()
 
-		yield_grp = self.cfg['yield_group'].strip().split(',')
-		workers = []
-		for worker_group in disks_dict.values():
-			skt_pipe_a, skt_pipe_b = multiprocessing.Pipe()
-			proc = threading.Thread(
-				target=AssetWizard.traversing_worker,
-				args=(yield_grp, worker_group, skt_pipe_a,)
-			)
-			workers.append(
-				(proc, skt_pipe_b)
-			)
-			proc.start()
+		self.checkpoint.save('shard merge')
 
-		asset_infos = []
-		for proc, skt_pipe in workers:
-			asset_infos.extend(skt_pipe.recv())
-			proc.join()
+		for shard_file, shard_result in shard_results:
+			for tgt_file in (shard_file, shard_file.with_suffix('.blend1')):
+				tgt_file.unlink(missing_ok=True)
 
-		workers.clear()
+	def split_unchanged(self, asset_infos):
+		"""
+			Separate asset infos, whose materials in this blend file
+			can be kept as they are (see keep_unchanged()),
+			from the ones, which have to be (re)built.
+			Returns ([asset_info, ...] to build, {cat_path, ...} of the kept)
+		"""
+		asset_infos = list(asset_infos)
+		if self.cfg['incremental'] != '1':
+			return asset_infos, set()
 
-		if pregen_index:
-			with open(pregen_index, 'wb') as tgt_file:
-				pickle.dump(asset_infos, tgt_file)
+		asset_list = [
+			ImageBasedAssetCatalogueItem(self.blender_cats, asset_info)
+			for asset_info in asset_infos
+		]
+		self.fingerprint_assets(asset_list)
 
-		return asset_infos
+		changed = []
+		kept_cat_paths = set()
+		for asset_info, asset in zip(asset_infos, asset_list):
+			if self.keep_unchanged(asset):
+				kept_cat_paths.add(asset.cat_path)
+			else:
+				changed.append(asset_info)
 
-	def assign_previews(self, asset_list):
-		# Sort assets into groups based by preview's disk letter
-		disks = {}
-		for asset in asset_list:
-			if not asset.preview.eligible:
-				continue
+		print(
+			'Keeping', len(asset_infos) - len(changed), 'unchanged assets,',
+			'rebuilding', len(changed)
+		)
 
-			disk_letter = Path(asset.preview.raw_path).anchor
-			if not disk_letter in disks:
-				disks[disk_letter] = []
+		return changed, kept_cat_paths
 
-			disks[disk_letter].append(asset)
+	def run_sharded(self):
+		"""
+			Same as process_assets(), but the assets are built
+			in parallel headless Blender processes.
+			In the category output mode, the shards are the output
+			and nothing is merged into this blend file.
+			Returns the set of catalogue paths of the processed assets.
+		"""
+		if self.cfg['output_mode'] == 'category':
+			shard_results = self.generate_category_shards(
+				self.iter_unique_asset_infos()
+			)
+			cat_paths = set()
+		else:
+			# Temporary shards start from scratch,
+			# so unchanged assets are filtered out here
+			asset_infos, cat_paths = self.split_unchanged(
+				self.iter_unique_asset_infos()
+			)
+			shard_results = self.generate_shards(asset_infos)
+			self.merge_shards(shard_results)
 
-		# Cook existing previews in threads
-		thread_count = 10
-		thread_pool = []
+		for shard_file, shard_result in shard_results:
+			cat_paths.update(shard_result['cat_paths'])
 
-		while any(d for d in disks.values()):
-			thread_pool.clear()
-			for disk in disks.values():
-				if not disk: continue
-				for i in range(thread_count):
-					if not disk: break
+		return cat_paths
 
-					asset = disk.pop()
+	def run(self):
+		sharded = any((
+			int(self.cfg['shard_processes'] or 0) > 1,
+			self.cfg['output_mode'] == 'category',
+		))
+		if sharded:
+			cat_paths = self.run_sharded()
+		else:
+			cat_paths = self.process_assets(self.iter_unique_asset_infos())
 
-					print(
-						len(disk),
-						'Cooking preview for',
-						asset.input_data['mat_name']
-					)
+		self.sync_catalogues(cat_paths)
 
-					thread = threading.Thread(
-						target=asset.preview.cook,
-						# args=(None,)
-					)
-					thread_pool.append(thread)
-					thread.start()
+		print('Done')
 
-			for thread in thread_pool:
-				thread.join()
+	@staticmethod
+	def asset_info_paths(asset_info):
+		"""
+			All file paths an asset info refers to.
+		"""
+		paths = set()
+		for key in (*AssetBaseData.defaults_maps, 'preview', 'import_source'):
+			tgt_path = asset_info.get(key)
+			if tgt_path and str(tgt_path) != 'None' and not str(tgt_path).startswith('$'):
+				paths.add(Path(tgt_path))
 
-		for asset in asset_list:
-			if asset.preview.cooked_path:
-				print('Applying preview for', asset.input_data['mat_name'])
-				asset.preview.apply()
+		return paths
 
-		return asset_list
+	@staticmethod
+	def asset_info_mat_name(asset_info):
+		return asset_info['mat_name'].split('/')[-1]
 
-	def run(self):
-		asset_list = []
+	def traverse_by_worker(self, workers):
+		"""
+			Returns {worker_name: {mat_name: asset_info}}
+		"""
+		yield_grp = self.yield_group
 
-		yield_grp = self.cfg['yield_group'].strip().split(',')
+		return {
+			worker.__name__: {
+				asset_info['mat_name']: asset_info
+				for asset_info in self.traversing_worker(yield_grp, [worker])
+			}
+			for worker in workers
+		}
 
-		# 1 - Create a list of catalogue items
-		for asset_info in self.create_asset_info_lists_mp():
-			asset_list.append(ImageBasedAssetCatalogueItem(
-				self.blender_cats,
-				asset_info
-			))
+	def apply_library_changes(self, workers, known_infos, changed):
+		"""
+			Re-traverse the workers, whose roots contain
+			any of the changed paths. Then only rebuild assets,
+			whose asset info changed or which refer to a changed file,
+			and remove assets which are gone.
+			- known_infos: Result of traverse_by_worker(). Updated in place.
+		"""
+		affected_workers = []
+		for worker in workers:
+			manifest = WorkerManifest(worker)
+			if any(manifest.contains(tgt_path) for tgt_path in changed):
+				affected_workers.append(worker)
 
-		# Save the blend file (just in case)
-		bpy.ops.wm.save_mainfile()
+		if not affected_workers:
+			return
 
-		# 2 - register catalogues
-		for asset in asset_list:
-			asset.create_cat()
+		rebuild = []
+		removed = []
+		for worker_name, new_infos in self.traverse_by_worker(affected_workers).items():
+			old_infos = known_infos.get(worker_name, {})
 
-		# Save the blend file (so that it refreshes catalogues)
-		bpy.ops.wm.save_mainfile()
+			for mat_name, asset_info in new_infos.items():
+				touched = any((
+					old_infos.get(mat_name) != asset_info,
+					not self.asset_info_paths(asset_info).isdisjoint(changed),
+				))
+				if touched:
+					rebuild.append(asset_info)
 
-		# 3 - Assign assets to catalogues
-		for asset in asset_list:
-			print('Assigning to catalogue', asset.input_data['mat_name'])
-			asset.reg()
+			for mat_name in old_infos.keys() - new_infos.keys():
+				removed.append(old_infos[mat_name])
 
-		# Save the blend file (just in case)
-		bpy.ops.wm.save_mainfile()
+			known_infos[worker_name] = new_infos
 
-		# confirm('Done registering. Press Enter To Continue')
+		for asset_info in removed:
+			mat_name = self.asset_info_mat_name(asset_info)
+			print('Watch mode: removing', asset_info['mat_name'])
+			if mat_name in bpy.data.materials:
+				bpy.data.materials.remove(bpy.data.materials[mat_name])
 
-		# Assign existing previews
-		self.assign_previews(asset_list)
+		# Rebuilt materials reuse loaded images, which would show old pixels
+		reloaded = ImageBasedAsset.image_index.reload(changed)
+		if reloaded:
+			print('Watch mode: reloaded', reloaded, 'modified images')
 
-		# confirm('Done with existing previews. Press Enter To Continue')
+		if rebuild:
+			print('Watch mode: regenerating', len(rebuild), 'assets')
+			self.process_assets(rebuild)
+		elif removed:
+			self.checkpoint.save('removed assets')
 
-		# Save the blend file (just in case)
-		bpy.ops.wm.save_mainfile()
+	def watch(self):
+		"""
+			Long-running incremental regeneration.
+			Keeps the traversal results in memory and only regenerates
+			assets affected by library changes.
+			Stops on KeyboardInterrupt.
+		"""
+		poll_interval = float(self.cfg['watch_poll_interval'])
+		settle_time = float(self.cfg['watch_settle'])
+
+		self.setup_directory_index()
+
+		workers = self.eligible_workers
+		known_infos = self.traverse_by_worker(workers)
+
+		# Catch up with whatever changed while not watching.
+		# Assets with unchanged sources are kept as is (see incremental)
+		self.process_assets([
+			asset_info
+			for worker_infos in known_infos.values()
+			for asset_info in worker_infos.values()
+		])
+
+		watcher = create_library_watcher(
+			{
+				str(root) for worker in workers
+				for root in WorkerManifest(worker).roots
+			},
+			self.device_scheduler
+		)
+		print('Watch mode: watching for changes using', type(watcher).__name__)
 
-		# Generate previews for assets that don't have one
-		with self.preview_wizard(BLENDER_EXECUTABLE) as pwzrd:
-			for asset in asset_list:
-				if asset.preview.done:
+		try:
+			while True:
+				changed = watcher.poll(poll_interval)
+				if not changed:
 					continue
 
-				print('Rendering preview for', asset.input_data['mat_name'])
-				render_result = pwzrd.render(
-					asset.input_data['custom_preview_prms'] | {
-						'material_source': str(BLEND_FILE),
-						'src_material_name': asset.datablock.name,
-					}
-				).decode()
-				if render_result.startswith('$fail'):
-					print(
-						'Failed to render Blender preview for',
-						asset.input_data['mat_name'],
-						'Reason:', render_result.split('$fail:')[-1]
-					)
-					continue
-				print(
-					'Rendered custom preview:', render_result,
-					'for', asset.input_data['mat_name']
-				)
-				# asset.set_preview(render_result)
-				asset.preview.cook(render_result)
-				asset.preview.apply(True)
+				# Wait for the library to calm down
+				while True:
+					more_changes = watcher.poll(settle_time)
+					if not more_changes:
+						break
+					changed |= more_changes
 
-		print('Done')
+				print('Watch mode:', len(changed), 'changed paths')
+				self.apply_library_changes(workers, known_infos, changed)
+		except KeyboardInterrupt:
+			print('Watch mode: stopped')
+		finally:
+			watcher.close()
+			DirectoryIndex.flush_scan_cache()
 
 
 def unpack_ffmpeg():
@@ -1177,9 +5189,16 @@ def unpack_ffmpeg():
 				f_out.write(chunk)
 
 
-if __name__ == '__main__':
+if __name__ == '__main__' and TRAVERSAL_PROCESS_ARG in sys.argv:
+	traversal_process_main()
+elif __name__ == '__main__' and SHARD_PROCESS_ARG in sys.argv:
+	shard_process_main()
+elif __name__ == '__main__':
 	if not FFMPEG.is_file():
 		unpack_ffmpeg()
 
 	asset_wzrd = AssetWizard()
-	asset_wzrd.run()
+	if asset_wzrd.cfg['mode'] == 'watch':
+		asset_wzrd.watch()
+	else:
+		asset_wzrd.run()